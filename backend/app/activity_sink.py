@@ -0,0 +1,203 @@
+import asyncio
+import contextvars
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from .conversations import UPSERTS
+from .database import AsyncSessionLocal
+from .models import ActivityDaily, ActivityLog
+
+
+@dataclass
+class ActivityEntry:
+    user_email: str
+    action: str
+    details: str
+    timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+# Queued by close(): the worker writes what it holds and what is ahead of it, then exits
+_STOP = object()
+
+
+class ActivitySink:
+    """Buffers activity rows in a bounded queue and batch-inserts them in the background.
+
+    With the ``drop`` policy a full queue discards new entries so message
+    traffic never waits on the audit trail; with ``block`` callers wait for
+    room instead.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float, policy: str):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown activity overflow policy: {policy}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def record(self, user_email: str, action: str, details: str) -> bool:
+        """Queue an activity row; returns False if it was dropped."""
+        self._ensure_worker()
+        entry = ActivityEntry(user_email=user_email, action=action, details=details)
+        if self.policy == "block":
+            await self._queue.put(entry)
+            return True
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def close(self) -> None:
+        """Stop the worker and write whatever is still queued.
+
+        The worker is stopped in line rather than cancelled, so a batch it
+        has already taken off the queue is still written.
+        """
+        if self._worker is not None:
+            if not self._worker.done():
+                await self._queue.put(_STOP)
+                await self._worker
+            self._worker = None
+        # Entries queued behind the stop marker, or left by a worker that died
+        while self._queue is not None and not self._queue.empty():
+            batch: List[ActivityEntry] = []
+            self._drain(batch)
+            if batch:
+                await self._write(batch)
+
+    def _drain(self, batch: List[ActivityEntry]) -> bool:
+        """Move queued entries into batch; True if the stop marker was reached."""
+        while len(batch) < self.batch_size and not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is _STOP:
+                return True
+            batch.append(entry)
+        return False
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            await asyncio.sleep(self.flush_interval)
+            stopping = self._drain(batch)
+            await self._write(batch)
+
+    async def _write(self, batch: List[ActivityEntry]) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(ActivityLog), [entry.__dict__ for entry in batch])
+                await db.commit()
+            self.written += len(batch)
+        except Exception as e:
+            # The audit trail is best effort; never let it take down the worker
+            self.failed += len(batch)
+            print(f"Warning: could not write {len(batch)} activity rows: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+activity_sink = ActivitySink(
+    settings.ACTIVITY_QUEUE_SIZE,
+    settings.ACTIVITY_BATCH_SIZE,
+    settings.ACTIVITY_FLUSH_INTERVAL_MS / 1000,
+    settings.ACTIVITY_OVERFLOW_POLICY,
+)
+
+
+async def rollup_activity(db: AsyncSession, cutoff: datetime, batch_size: int) -> int:
+    """Fold raw activity rows older than cutoff into per-day counts and delete them.
+
+    Each batch is deleted with RETURNING and only the rows it claimed are
+    counted, in the same transaction, so two workers running the job at
+    once never count a row twice. Returns the number of raw rows pruned.
+    """
+    upsert = UPSERTS[db.get_bind().dialect.name]
+    pruned = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(ActivityLog.id).where(
+                ActivityLog.id > last_id,
+                ActivityLog.timestamp < cutoff
+            ).order_by(ActivityLog.id.asc()).limit(batch_size)
+        )
+        ids = list(result.scalars().all())
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        result = await db.execute(
+            delete(ActivityLog).where(
+                ActivityLog.id.in_(ids)
+            ).returning(
+                ActivityLog.user_email, ActivityLog.action, ActivityLog.timestamp
+            ).execution_options(synchronize_session=False)
+        )
+        counts: Dict[Tuple[date, str, str], int] = defaultdict(int)
+        for row in result.all():
+            # Timestamps are stored in UTC, so this is the UTC day
+            counts[(row.timestamp.date(), row.user_email, row.action)] += 1
+
+        for (day, user_email, action), count in counts.items():
+            await db.execute(
+                upsert(ActivityDaily).values(
+                    day=day, user_email=user_email, action=action, count=count
+                ).on_conflict_do_update(
+                    index_elements=[ActivityDaily.day, ActivityDaily.user_email, ActivityDaily.action],
+                    set_={"count": ActivityDaily.count + count}
+                )
+            )
+            pruned += count
+        await db.commit()
+        if len(ids) < batch_size:
+            break
+    return pruned
+
+
+async def run_retention() -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.ACTIVITY_RETENTION_DAYS)
+    async with AsyncSessionLocal() as db:
+        return await rollup_activity(db, cutoff, settings.ACTIVITY_ROLLUP_BATCH_SIZE)
+
+
+async def retention_loop() -> None:
+    """Periodically roll up activity older than the retention window."""
+    while True:
+        try:
+            pruned = await run_retention()
+            if pruned:
+                print(f"Rolled up {pruned} activity rows")
+        except Exception as e:
+            print(f"Warning: activity rollup failed: {e}")
+        await asyncio.sleep(settings.ACTIVITY_ROLLUP_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    print(f"Rolled up {asyncio.run(run_retention())} activity rows")
@@ -0,0 +1,204 @@
+import asyncio
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from .conversations import pair_key
+from .database import AsyncSessionLocal
+from .models import Message, MessageSegment, MessageStatus
+from .wire import dumps, loads
+
+COMPRESSION_LEVEL = 6
+
+
+class ArchivedMessage(NamedTuple):
+    id: int
+    sender: str
+    recipient: str
+    content: str
+    timestamp: datetime
+    status: MessageStatus
+    is_bot_response: bool
+
+
+def _key(message) -> Tuple[datetime, int]:
+    return message.timestamp, message.id
+
+
+def encode_segment(user_a: str, messages: Sequence) -> bytes:
+    """Compress one conversation's messages; rows are [id, from_a, content, timestamp, status, bot]."""
+    rows = [
+        [m.id, m.sender == user_a, m.content, m.timestamp, m.status, bool(m.is_bot_response)]
+        for m in messages
+    ]
+    return zlib.compress(dumps(rows), COMPRESSION_LEVEL)
+
+
+def decode_segment(user_a: str, user_b: str, data: bytes) -> List[ArchivedMessage]:
+    messages = []
+    for row_id, from_a, content, timestamp, status, is_bot in loads(zlib.decompress(data)):
+        sender, recipient = (user_a, user_b) if from_a else (user_b, user_a)
+        messages.append(ArchivedMessage(
+            row_id, sender, recipient, content,
+            datetime.fromisoformat(timestamp), MessageStatus(status), is_bot
+        ))
+    return messages
+
+
+def hot_since() -> Optional[datetime]:
+    """Start of the hot window: older messages may have been archived. None when archival is off."""
+    if settings.ARCHIVE_AFTER_DAYS <= 0:
+        return None
+    return datetime.now(timezone.utc) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def is_hot(timestamp: datetime) -> bool:
+    """True if timestamp is recent enough that archival can never have moved it."""
+    bound = hot_since()
+    if bound is None:
+        return False
+    if timestamp.tzinfo is None:
+        # SQLite hands back naive UTC timestamps
+        bound = bound.replace(tzinfo=None)
+    return timestamp >= bound
+
+
+async def archive_messages(db: AsyncSession, cutoff: datetime, batch_size: int) -> int:
+    """Move read messages older than cutoff into per-month segments.
+
+    Unread messages stay in the hot table so delivery, read receipts and
+    unread counts keep working on them. Each batch is deleted with RETURNING
+    and written as segments in the same transaction, so two workers running
+    the job at once never archive a message twice. Returns the number moved.
+    """
+    moved = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Message.id).where(
+                Message.id > last_id,
+                Message.timestamp < cutoff,
+                Message.status == MessageStatus.READ
+            ).order_by(Message.id.asc()).limit(batch_size)
+        )
+        ids = list(result.scalars().all())
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        result = await db.execute(
+            delete(Message).where(
+                Message.id.in_(ids),
+                Message.status == MessageStatus.READ
+            ).returning(
+                Message.id, Message.sender, Message.recipient, Message.content,
+                Message.timestamp, Message.status, Message.is_bot_response
+            ).execution_options(synchronize_session=False)
+        )
+        groups = defaultdict(list)
+        for row in result.all():
+            user_a, user_b = pair_key(row.sender, row.recipient)
+            groups[(user_a, user_b, row.timestamp.strftime("%Y-%m"))].append(row)
+
+        segments = []
+        for (user_a, user_b, month), rows in groups.items():
+            rows.sort(key=_key)
+            segments.append({
+                "user_a": user_a,
+                "user_b": user_b,
+                "month": month,
+                "first_timestamp": rows[0].timestamp,
+                "first_id": rows[0].id,
+                "last_timestamp": rows[-1].timestamp,
+                "last_id": rows[-1].id,
+                "count": len(rows),
+                "data": encode_segment(user_a, rows),
+            })
+            moved += len(rows)
+        if segments:
+            await db.execute(insert(MessageSegment), segments)
+        await db.commit()
+        if len(ids) < batch_size:
+            break
+    return moved
+
+
+async def fetch_archived(
+    db: AsyncSession,
+    user: str,
+    peer: str,
+    position: Optional[Tuple[datetime, int]],
+    newer: bool,
+    limit: int,
+) -> List[ArchivedMessage]:
+    """Archived messages between user and peer past position, nearest first.
+
+    Walks the segment index from the position outwards and only decompresses
+    segments until ``limit`` messages are found and no remaining segment can
+    hold a closer one.
+    """
+    user_a, user_b = pair_key(user, peer)
+    query = select(
+        MessageSegment.id, MessageSegment.first_timestamp, MessageSegment.first_id,
+        MessageSegment.last_timestamp, MessageSegment.last_id
+    ).where(MessageSegment.user_a == user_a, MessageSegment.user_b == user_b)
+    if newer:
+        if position is not None:
+            timestamp, row_id = position
+            query = query.where(or_(
+                MessageSegment.last_timestamp > timestamp,
+                and_(MessageSegment.last_timestamp == timestamp, MessageSegment.last_id > row_id)
+            ))
+        query = query.order_by(MessageSegment.first_timestamp.asc(), MessageSegment.first_id.asc())
+    else:
+        if position is not None:
+            timestamp, row_id = position
+            query = query.where(or_(
+                MessageSegment.first_timestamp < timestamp,
+                and_(MessageSegment.first_timestamp == timestamp, MessageSegment.first_id < row_id)
+            ))
+        query = query.order_by(MessageSegment.last_timestamp.desc(), MessageSegment.last_id.desc())
+
+    found: List[ArchivedMessage] = []
+    for entry in (await db.execute(query)).all():
+        if len(found) >= limit:
+            edge = _key(found[-1])
+            start = (entry.first_timestamp, entry.first_id) if newer else (entry.last_timestamp, entry.last_id)
+            if (start > edge) if newer else (start < edge):
+                break
+        data = await db.scalar(select(MessageSegment.data).where(MessageSegment.id == entry.id))
+        for message in decode_segment(user_a, user_b, data):
+            if position is not None:
+                if newer and _key(message) <= position:
+                    continue
+                if not newer and _key(message) >= position:
+                    continue
+            found.append(message)
+        found.sort(key=_key, reverse=not newer)
+        del found[limit:]
+    return found
+
+
+async def run_archival() -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    async with AsyncSessionLocal() as db:
+        return await archive_messages(db, cutoff, settings.ARCHIVE_BATCH_SIZE)
+
+
+async def archive_loop() -> None:
+    """Periodically move messages past the hot window into segments."""
+    while True:
+        try:
+            moved = await run_archival()
+            if moved:
+                print(f"Archived {moved} messages")
+        except Exception as e:
+            print(f"Warning: message archival failed: {e}")
+        await asyncio.sleep(settings.ARCHIVE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    print(f"Archived {asyncio.run(run_archival())} messages")
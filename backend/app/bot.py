@@ -1,11 +1,91 @@
+import json
+import os
+import random
+import re
+import time
 from collections import deque
-from dataclasses import dataclass
-from typing import Deque, Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+from .bot_context import ConversationContext, context_store
 from .config import settings
 
+NO_MATCH = float("inf")
+
+NAME_STATEMENT = re.compile(r"\bmy name is ([A-Za-z][\w'-]{0,39})", re.IGNORECASE)
+NAME_QUESTIONS = ("what's my name", "what is my name", "do you know my name")
+# Messages that ask for more of whatever the last intent was
+FOLLOW_UPS = {"another", "another one", "one more", "more", "again", "tell me another"}
+
+
+class IntentMatcher:
+    """Classifies a message against every intent keyword in one pass.
+
+    Keywords are compiled into an Aho-Corasick automaton, so the cost per
+    message depends on its length, not on how many intents are loaded.
+    Intent order is the priority: an exact keyword match wins first, then
+    the earliest intent with a keyword anywhere in the message.
+    """
+
+    def __init__(self, intents: Dict[str, List[str]]):
+        self.names = list(intents)
+        self._exact: Dict[str, int] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[float] = [NO_MATCH]
+        for priority, keywords in enumerate(intents.values()):
+            for keyword in keywords:
+                keyword = keyword.lower().strip()
+                if not keyword:
+                    continue
+                self._exact.setdefault(keyword, priority)
+                node = 0
+                for ch in keyword:
+                    nxt = self._goto[node].get(ch)
+                    if nxt is None:
+                        self._goto.append({})
+                        self._out.append(NO_MATCH)
+                        nxt = len(self._goto) - 1
+                        self._goto[node][ch] = nxt
+                    node = nxt
+                self._out[node] = min(self._out[node], priority)
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # A node also ends every keyword its failure link ends
+                self._out[child] = min(self._out[child], self._out[self._fail[child]])
+                queue.append(child)
+
+    def match(self, message: str) -> Optional[str]:
+        """Return the highest-priority intent for message, or None."""
+        text = message.lower().strip()
+        exact = self._exact.get(text)
+        if exact is not None:
+            return self.names[exact]
+
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        best = NO_MATCH
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node] < best:
+                best = out[node]
+                if best == 0:
+                    break
+        return self.names[best] if best != NO_MATCH else None
+
 
 class WhatsEaseBot:
-    def __init__(self):
+    def __init__(self, intents_file: Optional[str] = None):
         self.bot_id = settings.BOT_IDENTIFIER
         self.name = "WhatsEase"
         self.intents = {
@@ -82,33 +162,115 @@ class WhatsEaseBot:
             "I'm still learning and don't understand that yet. What else can I help you with?"
         ]
 
+        self.matcher = IntentMatcher(self.intents)
+        self.intents_file = intents_file
+        self._intents_mtime: Optional[float] = None
+        self._next_reload_check = 0.0
+        if intents_file:
+            self.reload_intents()
+
+    def load_intents(self, path: str) -> None:
+        """Replace the intent set with the one in a JSON file.
+
+        The file maps intent names, in priority order, to their keywords and
+        responses::
+
+            {"intents": {"hi": {"keywords": ["hello"], "responses": ["Hi!"]}},
+             "fallback": ["Sorry?"]}
+
+        The new matcher is compiled before anything is swapped, so a bad file
+        leaves the current intents in place.
+        """
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        intents = {name: spec["keywords"] for name, spec in config["intents"].items()}
+        responses = {name: spec["responses"] for name, spec in config["intents"].items()}
+        matcher = IntentMatcher(intents)
+        self.intents, self.responses, self.matcher = intents, responses, matcher
+        if config.get("fallback"):
+            self.fallback_responses = config["fallback"]
+
+    def reload_intents(self) -> bool:
+        """Reload the intents file if it changed since the last load."""
+        try:
+            mtime = os.stat(self.intents_file).st_mtime
+        except OSError:
+            return False
+        if mtime == self._intents_mtime:
+            return False
+        try:
+            self.load_intents(self.intents_file)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Warning: could not load bot intents from {self.intents_file}: {e}")
+        self._intents_mtime = mtime
+        return True
+
+    def _maybe_reload(self) -> None:
+        if not self.intents_file:
+            return
+        now = time.monotonic()
+        if now >= self._next_reload_check:
+            self._next_reload_check = now + settings.BOT_INTENTS_RELOAD_SECONDS
+            self.reload_intents()
+
     def get_response(self, message: str) -> str:
         """Generate a response based on user input."""
-        message_lower = message.lower().strip()
-        
-        # Check for exact matches first
-        for intent, keywords in self.intents.items():
-            if message_lower in keywords:
-                import random
-                return random.choice(self.responses[intent])
-        
-        # Check for partial matches
-        for intent, keywords in self.intents.items():
-            for keyword in keywords:
-                if keyword in message_lower:
-                    import random
-                    return random.choice(self.responses[intent])
+        self._maybe_reload()
+        intent = self.matcher.match(message)
+        if intent is not None:
+            return random.choice(self.responses[intent])
         
         # Fallback response
-        import random
         return random.choice(self.fallback_responses)
 
+    def reply(self, message: str, context: ConversationContext) -> str:
+        """Generate a response using, and adding to, a user's context."""
+        self._maybe_reload()
+        text = message.lower().strip()
+        name = NAME_STATEMENT.search(message)
+        if name:
+            context.slots["user_name"] = name.group(1)
+            response = f"Nice to meet you, {name.group(1)}!"
+        elif any(q in text for q in NAME_QUESTIONS):
+            known = context.slots.get("user_name")
+            response = f"Your name is {known}." if known else "You haven't told me your name yet."
+        else:
+            intent = self.matcher.match(message)
+            if intent is None and text in FOLLOW_UPS:
+                intent = context.slots.get("last_intent")
+            if intent is not None and intent in self.responses:
+                context.slots["last_intent"] = intent
+                response = self._pick(self.responses[intent], context.last_reply)
+            else:
+                response = self._pick(self.fallback_responses, context.last_reply)
+        context.add_turn(message, response)
+        return response
+
+    @staticmethod
+    def _pick(responses: List[str], previous: Optional[str]) -> str:
+        # Avoid giving the same answer twice in a row
+        choices = [r for r in responses if r != previous] or responses
+        return random.choice(choices)
+
     def respond(self, user_email: str, message: str) -> str:
-        """Legacy method for backward compatibility."""
-        return self.get_response(message)
+        """Reply to a user with the context cached in this process."""
+        context = context_store.get(user_email) or ConversationContext.new(context_store.max_turns)
+        response = self.reply(message, context)
+        context_store.put(user_email, context)
+        return response
 
 
 # Create bot instance
-bot = WhatsEaseBot()
+bot = WhatsEaseBot(settings.BOT_INTENTS_FILE or None)
+
+
+def generate_reply(message: str, context: ConversationContext) -> Tuple[str, ConversationContext]:
+    """Module-level entry point so bot worker processes can run the bot.
+
+    Works on a copy of context and returns it updated, so a timed-out job
+    can never change the caller's copy.
+    """
+    context = context.copy()
+    return bot.reply(message, context), context
 
 
@@ -0,0 +1,167 @@
+import json
+import sys
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+from sqlalchemy import update
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import BotContext
+
+# Longest message or reply kept per turn, so one entry's size is bounded
+MAX_TURN_CHARS = 500
+# Measured CPython cost of an entry's containers (deque, slot dict, LRU
+# node) and of each turn tuple / slot item, on top of the strings themselves
+ENTRY_OVERHEAD = 1200
+TURN_OVERHEAD = 64
+SLOT_OVERHEAD = 40
+
+
+@dataclass
+class ConversationContext:
+    """What the bot remembers about one user: recent turns and extracted slots."""
+    turns: Deque[Tuple[str, str]]  # (user message, bot reply), oldest first
+    slots: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def new(cls, max_turns: int) -> "ConversationContext":
+        return cls(turns=deque(maxlen=max_turns))
+
+    @property
+    def last_reply(self) -> Optional[str]:
+        return self.turns[-1][1] if self.turns else None
+
+    def add_turn(self, message: str, reply: str) -> None:
+        self.turns.append((message[:MAX_TURN_CHARS], reply[:MAX_TURN_CHARS]))
+
+    def copy(self) -> "ConversationContext":
+        return ConversationContext(deque(self.turns, maxlen=self.turns.maxlen), dict(self.slots))
+
+    def size(self) -> int:
+        """Approximate bytes of memory held by this context."""
+        size = ENTRY_OVERHEAD
+        for message, reply in self.turns:
+            size += TURN_OVERHEAD + sys.getsizeof(message) + sys.getsizeof(reply)
+        for key, value in self.slots.items():
+            size += SLOT_OVERHEAD + sys.getsizeof(key) + sys.getsizeof(value)
+        return size
+
+    def to_json(self) -> str:
+        return json.dumps({"turns": list(self.turns), "slots": self.slots})
+
+    @classmethod
+    def from_json(cls, data: str, max_turns: int) -> "ConversationContext":
+        raw = json.loads(data)
+        return cls(deque((tuple(t) for t in raw["turns"]), maxlen=max_turns), raw["slots"])
+
+
+class ContextStore:
+    """Per-user bot contexts in an LRU bounded by total bytes and idle time.
+
+    The least recently used contexts are dropped once the store holds more
+    than ``max_bytes`` or a context has been idle for ``idle_seconds``. With
+    ``persist`` every saved context is also written to ``bot_contexts``, and
+    a context missing from memory (after eviction, a restart, or on another
+    worker) is reloaded from there on first use.
+    """
+
+    def __init__(self, max_turns: int, max_bytes: int, idle_seconds: float, persist: bool = False):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.persist = persist
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # user -> (last used, size, context)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, user: str) -> Optional[ConversationContext]:
+        """The cached context for user, if there is one."""
+        self._evict()
+        entry = self._data.get(user)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data[user] = (time.monotonic(), entry[1], entry[2])
+        self._data.move_to_end(user)
+        return entry[2]
+
+    def put(self, user: str, context: ConversationContext) -> None:
+        size = context.size()
+        old = self._data.pop(user, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._data[user] = (time.monotonic(), size, context)
+        self.bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        idle_before = time.monotonic() - self.idle_seconds
+        while self._data:
+            last_used, size, _ = next(iter(self._data.values()))
+            if self.bytes <= self.max_bytes and last_used >= idle_before:
+                break
+            self._data.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    async def load(self, user: str) -> ConversationContext:
+        """Cached context for user, else the persisted one, else a fresh one."""
+        context = self.get(user)
+        if context is not None:
+            return context
+        if self.persist:
+            try:
+                async with AsyncSessionLocal() as db:
+                    row = await db.get(BotContext, user)
+                if row is not None:
+                    context = ConversationContext.from_json(row.data, self.max_turns)
+                    self.loads += 1
+            except Exception as e:
+                print(f"Warning: could not load bot context for {user}: {e}")
+        if context is None:
+            context = ConversationContext.new(self.max_turns)
+        self.put(user, context)
+        return context
+
+    async def save(self, user: str, context: ConversationContext) -> None:
+        self.put(user, context)
+        if not self.persist:
+            return
+        data = context.to_json()
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(BotContext).where(BotContext.user_email == user).values(data=data)
+                )
+                if result.rowcount == 0:
+                    db.add(BotContext(user_email=user, data=data))
+                await db.commit()
+        except Exception as e:
+            print(f"Warning: could not persist bot context for {user}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+context_store = ContextStore(
+    settings.BOT_CONTEXT_TURNS,
+    settings.BOT_CONTEXT_MAX_BYTES,
+    settings.BOT_CONTEXT_IDLE_SECONDS,
+    settings.BOT_CONTEXT_PERSIST,
+)
@@ -0,0 +1,109 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Deque, Dict, Optional
+from .bot import generate_reply
+from .bot_context import context_store
+from .config import settings
+from .metrics import percentiles_ms
+
+
+class BotWorkerPool:
+    """Generates bot replies on worker threads or processes, off the event loop.
+
+    At most ``max_pending`` replies are in flight; beyond that, and for any
+    reply that takes longer than ``timeout`` seconds or fails, the caller gets
+    ``fallback`` instead of waiting. A timed-out job keeps its worker until it
+    finishes, so it still counts towards ``max_pending``.
+    """
+
+    def __init__(self, mode: str, workers: int, max_pending: int, timeout: float,
+                 fallback: str, window: int = 10000):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown BOT_WORKER_MODE: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.fallback = fallback
+        self._executor: Optional[Executor] = None
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a free worker."""
+        return max(self.pending - self.workers, 0)
+
+    def _get_executor(self) -> Executor:
+        # Created on first use so importing the app never forks worker processes
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bot")
+        return self._executor
+
+    async def reply(self, user_email: str, message: str) -> str:
+        """Bot reply to message, or the fallback reply if it can't be had in time.
+
+        The user's context goes to the worker with the job; the updated
+        context is saved only when the reply arrives in time.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return self.fallback
+        context = await context_store.load(user_email)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        job = self._get_executor().submit(generate_reply, message, context)
+        self.pending += 1
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._job_done))
+        try:
+            response, context = await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return self.fallback
+        except Exception as e:
+            self.failed += 1
+            print(f"Warning: bot reply failed: {e}")
+            return self.fallback
+        finally:
+            self._latencies.append(loop.time() - started)
+        await context_store.save(user_email, context)
+        return response
+
+    def _job_done(self) -> None:
+        self.pending -= 1
+        self.completed += 1
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pending": self.pending,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "failed": self.failed,
+            **percentiles_ms(self._latencies, "latency"),
+        }
+
+
+bot_pool = BotWorkerPool(
+    settings.BOT_WORKER_MODE,
+    settings.BOT_WORKERS,
+    settings.BOT_MAX_PENDING,
+    settings.BOT_REPLY_TIMEOUT_SECONDS,
+    settings.BOT_FALLBACK_REPLY,
+)
@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import os
+import socket
+import tempfile
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from .config import settings
+from .wire import SocketJSON
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+Handler = Callable[[dict], Awaitable[None]]
+
+# A peer whose outbound buffer grows past this is dropped by the hub
+PEER_BUFFER_LIMIT = 16 * 1024 * 1024
+# Tries, 100 ms apart, to reach the hub before a publish gives up
+HUB_CONNECT_ATTEMPTS = 20
+
+
+class ChannelMixin:
+    """Application messages over a Socket.IO pub/sub manager's channel.
+
+    Besides Socket.IO emits, application code can exchange its own messages
+    with the other workers through ``publish``/``subscribe`` (used for
+    cross-worker presence). Managers call ``_dispatch`` on everything they
+    receive and only pass on what it does not handle.
+    """
+    # Whether other workers are told when this one dies without saying goodbye
+    announces_host_down = False
+
+    def _init_channel(self) -> None:
+        self._handlers: Dict[str, Handler] = {}
+        self._on_connect: List[Callable[[], Awaitable[None]]] = []
+
+    def subscribe(self, method: str, handler: Handler) -> None:
+        """Route broker messages with this method from other workers to handler."""
+        self._handlers[method] = handler
+
+    def on_connect(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Run callback every time this worker (re)joins the channel."""
+        self._on_connect.append(callback)
+
+    async def publish(self, method: str, payload: dict) -> None:
+        await self._publish({"method": method, "host_id": self.host_id, **payload})
+
+    async def _connected(self) -> None:
+        for callback in self._on_connect:
+            await callback()
+
+    async def _dispatch(self, data: dict) -> bool:
+        """Hand an application message to its handler; False for Socket.IO traffic."""
+        handler = self._handlers.get(data.get("method"))
+        if handler is None:
+            return False
+        if data.get("host_id") != self.host_id:
+            await handler(data)
+        return True
+
+
+class LocalBrokerManager(ChannelMixin, AsyncPubSubManager):
+    """Client manager that links the workers on one machine over a Unix socket.
+
+    Every worker connects to a small hub that relays newline-delimited JSON
+    messages to all other workers. The hub runs inside whichever worker holds
+    the lock file; if that worker exits the OS releases the lock and another
+    worker takes over, so no outside service is needed.
+    """
+    name = "localbroker"
+    # The hub announces host_down when a worker's connection drops
+    announces_host_down = True
+
+    def __init__(self, path: str, channel: str = "socketio", write_only: bool = False,
+                 logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.path = path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connect_lock = asyncio.Lock()
+        self._hub: Optional[asyncio.AbstractServer] = None
+        self._hub_lock_file = None
+        self._peers: Dict[asyncio.StreamWriter, Optional[str]] = {}
+        self._init_channel()
+
+    async def close(self) -> None:
+        """Leave the hub and, if this worker hosts it, shut it down."""
+        self._reset()
+        if self._hub is not None:
+            for peer in list(self._peers):
+                peer.close()
+            self._hub.close()
+            self._hub = None
+            self._hub_lock_file.close()
+            self._hub_lock_file = None
+
+    async def _become_hub(self) -> None:
+        if self._hub is not None:
+            return
+        lock_file = open(self.path + ".lock", "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return
+        # Holding the lock means any socket file left behind is stale
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._hub_lock_file = lock_file
+        self._hub = await asyncio.start_unix_server(self._serve_peer, path=self.path)
+        self._get_logger().info("localbroker hub listening on %s", self.path)
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._peers[writer] = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if self._peers.get(writer) is None:
+                    # The first line from every peer is its hello
+                    self._peers[writer] = self.json.loads(line).get("host_id")
+                self._relay(line, writer)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            host_id = self._peers.pop(writer, None)
+            writer.close()
+            if host_id:
+                self._relay(self.json.dumps({"method": "host_down", "host_id": host_id}).encode() + b"\n")
+
+    def _relay(self, line: bytes, source: Optional[asyncio.StreamWriter] = None) -> None:
+        for peer in list(self._peers):
+            if peer is source:
+                continue
+            if peer.transport.get_write_buffer_size() > PEER_BUFFER_LIMIT:
+                self._get_logger().warning("localbroker dropping slow peer %s", self._peers.get(peer))
+                peer.close()
+                self._peers.pop(peer, None)
+                continue
+            peer.write(line)
+
+    async def _connect(self) -> None:
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            for _ in range(HUB_CONNECT_ATTEMPTS):
+                await self._become_hub()
+                try:
+                    self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    await asyncio.sleep(0.1)
+            else:
+                # Another process holds the hub lock but is not listening
+                raise ConnectionError(f"no localbroker hub listening on {self.path}")
+            self._writer.write(self.json.dumps({"method": "hello", "host_id": self.host_id}).encode() + b"\n")
+            await self._writer.drain()
+        await self._connected()
+
+    def _reset(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _publish(self, data) -> None:
+        line = self.json.dumps(data).encode() + b"\n"
+        for retries_left in range(1, -1, -1):  # 2 attempts
+            try:
+                await self._connect()
+                self._writer.write(line)
+                await self._writer.drain()
+                return
+            except (ConnectionError, OSError) as exc:
+                self._reset()
+                if not retries_left:
+                    self._get_logger().error("localbroker publish failed: %s", exc)
+
+    async def _listen(self):
+        while True:
+            try:
+                await self._connect()
+                line = await self._reader.readline()
+            except (ConnectionError, OSError):
+                line = b""
+            if not line:
+                # Hub went away; reconnect (possibly hosting it ourselves)
+                self._reset()
+                await asyncio.sleep(0.1)
+                continue
+            data = self.json.loads(line)
+            if await self._dispatch(data):
+                continue
+            yield data
+
+
+class RedisBrokerManager(ChannelMixin, socketio.AsyncRedisManager):
+    """Redis client manager that also carries application messages.
+
+    Redis gives no signal when a worker dies, so listeners of this channel
+    have to expire silent workers themselves (presence does so with a
+    heartbeat). A worker that shuts down cleanly announces it.
+    """
+    name = "redisbroker"
+
+    def __init__(self, url: str, channel: str = "socketio", write_only: bool = False,
+                 logger=None, json=None):
+        super().__init__(url, channel=channel, write_only=write_only, logger=logger, json=json)
+        self._init_channel()
+
+    async def close(self) -> None:
+        await self.publish("host_down", {})
+
+    async def _listen(self):
+        # The library's listener, plus the on_connect callbacks after each
+        # (re)subscribe so presence can resynchronise
+        channel = self.channel.encode("utf-8")
+        retry_sleep = 1
+        while True:
+            try:
+                self._redis_connect()
+                await self.pubsub.subscribe(self.channel)
+                retry_sleep = 1
+                await self._connected()
+                async for message in self.pubsub.listen():
+                    if message["channel"] != channel or message["type"] != "message":
+                        continue
+                    try:
+                        data = self.json.loads(message["data"])
+                    except ValueError:
+                        continue
+                    if isinstance(data, dict) and await self._dispatch(data):
+                        continue
+                    yield data
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self._get_logger().error("redis listen failed, retrying in %s secs: %s", retry_sleep, exc)
+                await asyncio.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+
+def broker_path() -> str:
+    """The hub socket for this deployment.
+
+    The default lives in the shared temp dir, so it is keyed by the working
+    directory and database: the workers of one server share a hub, while
+    other deployments, dev servers and test runs on the machine do not.
+    """
+    if settings.SOCKETIO_BROKER_PATH:
+        return settings.SOCKETIO_BROKER_PATH
+    instance = hashlib.sha256(f"{os.getcwd()}|{settings.DATABASE_URL}".encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"whatsease-socketio-{instance}.sock")
+
+
+def create_client_manager() -> Optional[socketio.AsyncManager]:
+    """Build the Socket.IO client manager selected by ``SOCKETIO_MANAGER``.
+
+    ``local`` links the workers on this machine, ``memory`` keeps everything in
+    one process, and a ``redis://`` URL links workers across machines.
+    """
+    choice = settings.SOCKETIO_MANAGER
+    if choice == "memory":
+        return None
+    if choice.startswith(("redis://", "rediss://")):
+        return RedisBrokerManager(choice, json=SocketJSON)
+    if choice == "local":
+        if fcntl is None or not hasattr(socket, "AF_UNIX"):
+            print("Warning: local Socket.IO broker needs Unix sockets; running single-process")
+            return None
+        return LocalBrokerManager(broker_path(), json=SocketJSON)
+    raise ValueError(f"Unknown SOCKETIO_MANAGER: {choice}")
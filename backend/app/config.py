@@ -2,8 +2,24 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./whatsease.db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # PostgreSQL only; 0 disables
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_SINGLE_WRITER: bool = True  # route all writes through one connection
     JWT_SECRET: str = "change_me"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
+    BCRYPT_ROUNDS: int = 12
+    HASH_WORKERS: int = 4
+    HASH_MAX_PENDING: int = 64
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL_SECONDS: int = 60
     ALLOWED_ORIGINS: list = [
         "http://localhost:3000",
         "http://localhost:5173",
@@ -12,6 +28,51 @@ class Settings(BaseSettings):
     ]
     LOG_LEVEL: str = "INFO"
     BOT_IDENTIFIER: str = "whatsease_bot"
+    BOT_INTENTS_FILE: str = ""  # optional JSON intent set, reloaded when it changes
+    BOT_INTENTS_RELOAD_SECONDS: float = 5.0
+    BOT_WORKER_MODE: str = "thread"  # "thread" or "process" for CPU-bound bot backends
+    BOT_WORKERS: int = 2
+    BOT_MAX_PENDING: int = 32
+    BOT_REPLY_TIMEOUT_SECONDS: float = 5.0
+    BOT_FALLBACK_REPLY: str = "Sorry, I'm a bit busy right now. Please try again in a moment."
+    BOT_CONTEXT_TURNS: int = 10
+    BOT_CONTEXT_MAX_BYTES: int = 64 * 1024 * 1024
+    BOT_CONTEXT_IDLE_SECONDS: float = 1800.0
+    BOT_CONTEXT_PERSIST: bool = False
+    SOCKETIO_MANAGER: str = "local"  # "local", "memory" or a redis:// URL
+    SOCKETIO_BROKER_PATH: str = ""  # defaults to a socket in the temp dir, one per working dir and database
+    PRESENCE_QUERY_MAX: int = 500
+    PRESENCE_HEARTBEAT_SECONDS: float = 15.0  # redis only: snapshot interval; silent workers expire after 3
+    PENDING_FLUSH_CHUNK: int = 200
+    SOCKET_EVENT_RATE: float = 20.0  # inbound events per second per user; 0 disables
+    SOCKET_EVENT_BURST: int = 40
+    SOCKET_EVENT_LIMITS: dict = {"send_message": [10, 30]}  # event -> [rate, burst], own bucket
+    SOCKET_THROTTLE_TOLERANCE: int = 50  # throttled events (one forgiven per second) before disconnect; 0 never
+    SOCKET_OUTBOUND_QUEUE: int = 256  # packets queued for one session before it counts as slow; 0 disables
+    SOCKET_SLOW_CONSUMER_SECONDS: float = 10.0  # a session slow for this long is disconnected
+    WRITE_BATCH_MAX_SIZE: int = 100
+    WRITE_BATCH_MAX_LATENCY_MS: float = 2.0
+    ACTIVITY_QUEUE_SIZE: int = 10000
+    ACTIVITY_BATCH_SIZE: int = 500
+    ACTIVITY_FLUSH_INTERVAL_MS: float = 200.0
+    ACTIVITY_OVERFLOW_POLICY: str = "drop"  # or "block"
+    ACTIVITY_RETENTION_DAYS: int = 30
+    ACTIVITY_ROLLUP_INTERVAL_SECONDS: int = 3600
+    ACTIVITY_ROLLUP_BATCH_SIZE: int = 5000
+    ARCHIVE_AFTER_DAYS: int = 180  # 0 disables archival
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+    ARCHIVE_BATCH_SIZE: int = 5000
+    METRICS_ENABLED: bool = True
+    QUERY_BUDGET_MODE: str = "off"  # "warn" or "raise" in debug/staging
+    QUERY_BUDGET_DEFAULT: int = 20
+    QUERY_BUDGETS: dict = {}  # per endpoint, e.g. {"GET /users": 2, "socket send_message": 3}
+    QUERY_REPEAT_LIMIT: int = 5  # one statement this often in a scope is reported as N+1
+    MESSAGES_PAGE_SIZE: int = 50
+    MESSAGES_PAGE_MAX: int = 200
+    ACTIVITY_PAGE_SIZE: int = 50
+    ACTIVITY_PAGE_MAX: int = 200
+    ACTIVITY_EXPORT_CHUNK: int = 1000
+    ADMIN_EMAILS: list = []  # accounts allowed to use admin-only endpoints
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,191 @@
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import Conversation, Message, MessageSegment, MessageStatus
+
+# INSERT ... ON CONFLICT builders for the supported backends
+UPSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def pair_key(first: str, second: str) -> Tuple[str, str]:
+    """Return the participants of a conversation in storage order."""
+    return (first, second) if first <= second else (second, first)
+
+
+def _unread_column(reader: str, user_a: str):
+    return Conversation.unread_a if reader == user_a else Conversation.unread_b
+
+
+async def record_messages(
+    db: AsyncSession,
+    entries: Iterable[Tuple[str, str, int, bool]]
+) -> Dict[Tuple[str, str], int]:
+    """Update conversation summaries for newly flushed messages.
+
+    ``entries`` are ``(sender, recipient, message_id, unread)`` tuples. Runs
+    in the caller's transaction, so the summaries commit together with the
+    message rows. Returns the unread count keyed by ``(reader, peer)`` for
+    every touched conversation.
+    """
+    # One UPDATE per pair, however many of its messages are in the batch
+    pairs: Dict[Tuple[str, str], List[int]] = {}
+    for sender, recipient, message_id, unread in entries:
+        key = pair_key(sender, recipient)
+        summary = pairs.setdefault(key, [message_id, 0, 0])
+        summary[0] = max(summary[0], message_id)
+        if unread:
+            summary[1 if recipient == key[0] else 2] += 1
+
+    # Upsert, so two first messages for a new pair cannot both insert
+    upsert = UPSERTS[db.get_bind().dialect.name]
+    counts: Dict[Tuple[str, str], int] = {}
+    for (user_a, user_b), (last_id, add_a, add_b) in pairs.items():
+        statement = upsert(Conversation).values(
+            user_a=user_a,
+            user_b=user_b,
+            last_message_id=last_id,
+            last_activity=func.now(),
+            unread_a=add_a,
+            unread_b=add_b
+        )
+        result = await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[Conversation.user_a, Conversation.user_b],
+                set_={
+                    "last_message_id": last_id,
+                    "last_activity": func.now(),
+                    "unread_a": Conversation.unread_a + add_a,
+                    "unread_b": Conversation.unread_b + add_b,
+                }
+            ).returning(
+                Conversation.unread_a, Conversation.unread_b
+            ).execution_options(synchronize_session=False)
+        )
+        row = result.one()
+        counts[(user_b, user_a)] = row[1]
+        counts[(user_a, user_b)] = row[0]
+    return counts
+
+
+async def record_message(db: AsyncSession, message: Message) -> int:
+    """Update the conversation summary for one flushed message.
+
+    Returns the recipient's unread count for this conversation.
+    """
+    counts = await record_messages(db, [(
+        message.sender,
+        message.recipient,
+        message.id,
+        message.status != MessageStatus.READ,
+    )])
+    return counts[(message.recipient, message.sender)]
+
+
+async def mark_read(db: AsyncSession, reader: str, peer: str, count: int = 1) -> int:
+    """Subtract messages from peer that reader has just read.
+
+    Returns the reader's remaining unread count for this conversation.
+    """
+    if count <= 0:
+        return await unread_count(db, reader, peer)
+    user_a, user_b = pair_key(reader, peer)
+    unread = _unread_column(reader, user_a)
+    remaining = await db.scalar(
+        update(Conversation).where(
+            Conversation.user_a == user_a,
+            Conversation.user_b == user_b
+        ).values({
+            unread: case((unread > count, unread - count), else_=0),
+        }).returning(unread).execution_options(synchronize_session=False)
+    )
+    return remaining or 0
+
+
+async def unread_count(db: AsyncSession, reader: str, peer: str) -> int:
+    """Number of messages from peer that reader has not read."""
+    user_a, user_b = pair_key(reader, peer)
+    unread = _unread_column(reader, user_a)
+    value = await db.scalar(
+        select(unread).where(
+            Conversation.user_a == user_a,
+            Conversation.user_b == user_b
+        )
+    )
+    return value or 0
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every conversation summary from the messages table.
+
+    Maintenance helper for seeding and upgrades, so it uses a sync session.
+    """
+    db.query(Conversation).delete()
+
+    rows = db.query(
+        Message.sender,
+        Message.recipient,
+        func.max(Message.id),
+        func.max(Message.timestamp),
+        func.sum(case((Message.status != MessageStatus.READ, 1), else_=0))
+    ).group_by(Message.sender, Message.recipient).all()
+
+    summaries: Dict[Tuple[str, str], dict] = {}
+    for sender, recipient, last_id, last_ts, unread in rows:
+        key = pair_key(sender, recipient)
+        conversation = summaries.get(key)
+        if conversation is None:
+            conversation = summaries[key] = {
+                "user_a": key[0],
+                "user_b": key[1],
+                "last_message_id": last_id,
+                "last_activity": last_ts,
+                "unread_a": 0,
+                "unread_b": 0,
+            }
+        elif last_id > conversation["last_message_id"]:
+            conversation["last_message_id"] = last_id
+            conversation["last_activity"] = last_ts
+        conversation["unread_a" if recipient == key[0] else "unread_b"] += unread or 0
+
+    # Archived segments only hold read messages, but they still keep a pair's
+    # conversation (and its last activity) alive
+    archived = db.query(
+        MessageSegment.user_a,
+        MessageSegment.user_b,
+        func.max(MessageSegment.last_id),
+        func.max(MessageSegment.last_timestamp)
+    ).group_by(MessageSegment.user_a, MessageSegment.user_b).all()
+    for user_a, user_b, last_id, last_ts in archived:
+        conversation = summaries.get((user_a, user_b))
+        if conversation is None:
+            summaries[(user_a, user_b)] = {
+                "user_a": user_a,
+                "user_b": user_b,
+                "last_message_id": last_id,
+                "last_activity": last_ts,
+                "unread_a": 0,
+                "unread_b": 0,
+            }
+        elif last_id > conversation["last_message_id"]:
+            conversation["last_message_id"] = last_id
+            conversation["last_activity"] = last_ts
+
+    # Core executemany: seeded databases can have hundreds of thousands of pairs
+    if summaries:
+        db.execute(insert(Conversation), list(summaries.values()))
+    db.commit()
+    return len(summaries)
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild(db)} conversations")
+    finally:
+        db.close()
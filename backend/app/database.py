@@ -1,22 +1,148 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
 from .config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Async drivers used by the request path for each sync URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver."""
+    parsed = make_url(url)
+    async_driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if async_driver is None or parsed.drivername == async_driver:
+        return url
+    return parsed.set(drivername=async_driver).render_as_string(hide_password=False)
+
+def _is_memory(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _pool_kwargs() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+def engine_profile(url: str) -> dict:
+    """Engine keyword arguments tuned for the database behind url."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        if _is_memory(parsed):
+            # In-memory SQLite is bound to a single connection
+            return {}
+        options = _pool_kwargs()
+        if parsed.drivername == "sqlite" or parsed.drivername == "sqlite+pysqlite":
+            # Pooled connections are handed between threads
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    options = {**_pool_kwargs(), "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if backend == "postgresql" and timeout:
+        if parsed.drivername == "postgresql+asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+def _sqlite_pragmas(engine: Engine) -> None:
+    """Apply the SQLite settings to every new connection of engine."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}",
+    ]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def make_engine(url: str, **overrides) -> Engine:
+    engine = create_engine(url, **{**engine_profile(url), **overrides})
+    if engine.dialect.name == "sqlite" and not _is_memory(engine.url):
+        _sqlite_pragmas(engine)
+    return engine
+
+def make_async_engine(url: str, **overrides) -> AsyncEngine:
+    engine = create_async_engine(url, **{**engine_profile(url), **overrides})
+    if engine.dialect.name == "sqlite" and not _is_memory(engine.url):
+        _sqlite_pragmas(engine.sync_engine)
+    return engine
+
+def uses_single_writer(url: str) -> bool:
+    """SQLite allows one writer at a time, so writes queue in-process for one connection."""
+    parsed = make_url(url)
+    return settings.SQLITE_SINGLE_WRITER and parsed.get_backend_name() == "sqlite" and not _is_memory(parsed)
+
+def make_session_factory(reader: AsyncEngine, writer: AsyncEngine) -> async_sessionmaker:
+    """Async sessions that read from reader and write through writer."""
+    if writer is reader:
+        return async_sessionmaker(reader, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+    class RoutingSession(Session):
+        def get_bind(self, mapper=None, clause=None, **kw):
+            # Once a session has written it stays on the writer, so it can
+            # read back its own uncommitted changes
+            if self.info.get("writer") or self._flushing or isinstance(clause, UpdateBase):
+                self.info["writer"] = True
+                return writer.sync_engine
+            return reader.sync_engine
+
+    @event.listens_for(RoutingSession, "after_transaction_end")
+    def release_writer(session, transaction):
+        # The pin only lasts for the transaction: after a commit or rollback
+        # the session reads from the pool again instead of taking the single
+        # writer connection back out
+        if transaction.parent is None:
+            session.info.pop("writer", None)
+
+    return async_sessionmaker(
+        class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+    )
+
+# Sync engine for schema creation, seeding and maintenance scripts
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engines used by the routers and Socket.IO handlers
+ASYNC_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+if uses_single_writer(ASYNC_DATABASE_URL):
+    async_writer_engine = make_async_engine(ASYNC_DATABASE_URL, pool_size=1, max_overflow=0)
+else:
+    async_writer_engine = async_engine
+AsyncSessionLocal = make_session_factory(async_engine, async_writer_engine)
+
 Base = declarative_base()
 
-def get_db_session():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def create_schema(bind: Engine) -> None:
+    """Create missing tables, then any model index the existing tables lack.
 
+    ``create_all`` skips tables that already exist, so on an upgraded
+    database the indexes added since it was created have to be added here.
+    Both steps are no-ops when the schema is current.
+    """
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
+async def get_db_session():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,15 +1,36 @@
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from .security import decode_access_token
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import TTLCache
+from .config import settings
+from .security import decode_access_token_payload
 from .database import get_db_session
 from .models import User
 
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# token -> verified user email, so repeat requests skip the JWT decode and user lookup
+principal_cache = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL_SECONDS)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    principal_cache.discard_where(lambda email: email in emails)
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db_session)
+):
     token = credentials.credentials
-    email = decode_access_token(token)
+    email = principal_cache.get(token)
+    if email is not None:
+        return email
+
+    payload = decode_access_token_payload(token)
+    email = payload.get("sub") if payload else None
     if email is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -17,18 +38,26 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Check if user exists in SQLite
-    db = next(get_db_session())
-    try:
-        user = db.query(User).filter(User.email == email).first()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return email
-    finally:
-        db.close()
+    # Check if user exists (shares the request's session)
+    user_id = await db.scalar(select(User.id).where(User.email == email))
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
+    # Never cache a principal past its token's own expiry
+    ttl = settings.AUTH_CACHE_TTL_SECONDS
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    principal_cache.set(token, email, ttl)
+    return email
 
+async def get_admin_user(current_user: str = Depends(get_current_user)):
+    if current_user not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
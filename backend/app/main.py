@@ -1,14 +1,42 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, users, messages, activity
-from .database import engine, Base
-from .sio import sio
+from .config import settings
+from .database import engine, async_engine, async_writer_engine, create_schema
+from . import metrics, query_budget, search
+from .sio import sio, start_client_manager, stop_client_manager
+from .pipeline import message_pipeline
+from .activity_sink import activity_sink, retention_loop
+from .archive import archive_loop
+from .bot_pool import bot_pool
+from .bot_context import context_store
+from .deps import principal_cache
+from .presence import presence
+from .ratelimit import event_limiter
+from .security import password_hasher
 import socketio
 
-app = FastAPI(title="WhatsEase API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_client_manager()
+    retention = asyncio.create_task(retention_loop())
+    archival = asyncio.create_task(archive_loop()) if settings.ARCHIVE_AFTER_DAYS > 0 else None
+    yield
+    retention.cancel()
+    if archival is not None:
+        archival.cancel()
+    await message_pipeline.close()
+    await activity_sink.close()
+    bot_pool.close()
+    await stop_client_manager()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+app = FastAPI(title="WhatsEase API", version="1.0.0", lifespan=lifespan)
+
+# Create database tables, and indexes missing from older databases
+create_schema(engine)
+search.install(engine)
 
 # CORS middleware
 app.add_middleware(
@@ -25,6 +53,46 @@ app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(messages.router, prefix="/messages", tags=["messages"])
 app.include_router(activity.router, prefix="/activity", tags=["activity"])
 
+# Metrics: request and statement timing are recorded as they happen; the
+# gauges and component stats below are only read when /metrics is scraped
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    for db_engine in {engine, async_engine.sync_engine, async_writer_engine.sync_engine}:
+        metrics.instrument_engine(db_engine)
+    metrics.registry.gauge(
+        "socketio_connected_sockets", "Authenticated Socket.IO sessions on this worker.",
+        lambda: presence.stats()["sessions"]
+    )
+    metrics.registry.gauge(
+        "socketio_rooms", "Socket.IO rooms on this worker.",
+        lambda: len(sio.manager.rooms.get("/", {}))
+    )
+    for component, stats in (
+        ("presence", presence.stats),
+        ("socket_limiter", event_limiter.stats),
+        ("socket_outbound", sio.outbound_stats),
+        ("principal_cache", principal_cache.stats),
+        ("password_hasher", password_hasher.stats),
+        ("message_pipeline", message_pipeline.stats),
+        ("activity_sink", activity_sink.stats),
+        ("bot_pool", bot_pool.stats),
+        ("bot_context", context_store.stats),
+    ):
+        metrics.registry.stats(component, stats)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+# Debug/staging: count the queries each request runs against its budget
+if settings.QUERY_BUDGET_MODE != "off":
+    app.add_middleware(
+        query_budget.QueryBudgetMiddleware,
+        label=lambda scope: f"{scope['method']} {metrics.route_label(scope)}"
+    )
+    if settings.METRICS_ENABLED:
+        metrics.registry.stats("query_budget", query_budget.stats)
+
 # Socket.IO app
 sio_app = socketio.ASGIApp(sio, app)
 
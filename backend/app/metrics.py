@@ -0,0 +1,254 @@
+import re
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; wide enough for both cached REST reads and bcrypt logins
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def percentiles_ms(samples: Iterable[float], name: str, points: Tuple[float, ...] = (0.50, 0.99)) -> Dict[str, float]:
+    """Nearest-rank percentiles of latency samples in seconds, as ``{name}_p50_ms``-style stats."""
+    ordered = sorted(samples)
+    result = {}
+    for p in points:
+        value = ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1000 if ordered else 0.0
+        result[f"{name}_p{round(p * 100)}_ms"] = round(value, 3)
+    return result
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Latency histogram keyed by a tuple of label values.
+
+    ``observe`` is a dict lookup, a bisect and two additions; the cumulative
+    bucket counts Prometheus expects are only built when scraped.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[Labels, List[float]] = {}  # labels -> per-bucket counts (+Inf last), then sum
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, labels: Labels, started: float) -> None:
+        self.observe(labels, time.perf_counter() - started)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self._series.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                total += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {total}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]!r}")
+            lines.append(f"{self.name}_count{label_text} {total}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time, so it costs nothing in between."""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_number(self.read())}",
+        ]
+
+
+class StatsCollector:
+    """Exposes the numeric entries of a component's ``stats()`` dict as gauges."""
+
+    def __init__(self, component: str, stats: Callable[[], Dict[str, float]]):
+        self.component = component
+        self.stats = stats
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, value in self.stats().items():
+            if not isinstance(value, (int, float)):
+                continue
+            name = f"whatsease_{self.component}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._collectors = []
+
+    def register(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, read))
+
+    def stats(self, component: str, stats: Callable[[], Dict[str, float]]) -> StatsCollector:
+        return self.register(StatsCollector(component, stats))
+
+    def render(self) -> str:
+        lines = []
+        for collector in self._collectors:
+            try:
+                lines.extend(collector.render())
+            except Exception as e:
+                # One broken collector should not blank the whole scrape
+                print(f"Warning: metrics collector failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "path")
+))
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP responses by route and status code.", ("method", "path", "status")
+))
+socketio_event_seconds = registry.register(Histogram(
+    "socketio_event_duration_seconds", "Socket.IO handler latency by event.", ("event",)
+))
+socketio_throttled = registry.register(Counter(
+    "socketio_throttled_events_total", "Inbound Socket.IO events dropped by per-user rate limits.", ("event",)
+))
+socketio_outbound = registry.register(Counter(
+    "socketio_outbound_events_total", "Events for slow clients that were held back, coalesced or dropped.",
+    ("outcome",)
+))
+socketio_forced_disconnects = registry.register(Counter(
+    "socketio_forced_disconnects_total", "Sessions disconnected for staying over a limit.", ("reason",)
+))
+db_query_seconds = registry.register(Histogram(
+    "db_query_duration_seconds", "Database statement latency by statement type.", ("operation",)
+))
+db_errors = registry.register(Counter(
+    "db_errors_total", "Database statements that raised.", ("operation",)
+))
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip()[:8].split(None, 1)
+    operation = word[0].upper() if word else ""
+    return operation if operation in _OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement an engine runs (pass ``.sync_engine`` for async engines)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        db_query_seconds.observe((_operation(statement),), time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        pending = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if pending:
+            pending.pop()
+        db_errors.inc((_operation(context.statement or ""),))
+
+
+def route_label(scope) -> str:
+    """Full route template of the matched endpoint, e.g. ``/messages/search``."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # Depending on the FastAPI version an included router's routes carry its
+    # prefix or not; the request path's first segment supplies it when missing.
+    prefix = "/" + scope["path"].lstrip("/").split("/", 1)[0]
+    return template if template.startswith(prefix) else prefix + template
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times each request against the route it matched.
+
+    Labelling by the route template (``/messages/search``) rather than the raw
+    path keeps the number of series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            path = route_label(scope)
+            method = scope["method"]
+            http_request_seconds.observe((method, path), time.perf_counter() - started)
+            http_requests.inc((method, path, str(status_code)))
+
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Enum, Text, LargeBinary, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -28,13 +28,93 @@ class Message(Base):
     status = Column(Enum(MessageStatus), default=MessageStatus.SENT)
     is_bot_response = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # Keyset pagination over one direction of a conversation
+        Index("ix_messages_pair_timestamp", "sender", "recipient", "timestamp", "id"),
+        # Pending-delivery scan when a recipient reconnects
+        Index("ix_messages_recipient_status", "recipient", "status", "id"),
+    )
+
+class Conversation(Base):
+    """Per-pair summary kept in step with message writes.
+
+    Participants are stored in sorted order so each pair has exactly one row;
+    ``unread_a`` counts messages to ``user_a`` that it has not read yet.
+    """
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_a = Column(String, nullable=False)
+    user_b = Column(String, nullable=False)
+    last_message_id = Column(Integer, nullable=True)
+    last_activity = Column(DateTime(timezone=True), server_default=func.now())
+    unread_a = Column(Integer, nullable=False, default=0)
+    unread_b = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_a", "user_b", name="uq_conversations_pair"),
+        Index("ix_conversations_user_b", "user_b", "user_a"),
+        Index("ix_conversations_a_activity", "user_a", "last_activity"),
+        Index("ix_conversations_b_activity", "user_b", "last_activity"),
+    )
+
+class MessageSegment(Base):
+    """A compressed, append-only block of archived messages from one conversation month.
+
+    The columns besides ``data`` form the per-conversation index: reads find
+    the segments covering a keyset position without opening any blobs.
+    """
+    __tablename__ = "message_segments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_a = Column(String, nullable=False)
+    user_b = Column(String, nullable=False)
+    month = Column(String, nullable=False)  # YYYY-MM
+    first_timestamp = Column(DateTime(timezone=True), nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_timestamp = Column(DateTime(timezone=True), nullable=False)
+    last_id = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ix_message_segments_pair_last", "user_a", "user_b", "last_timestamp", "last_id"),
+    )
+
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_email = Column(String, nullable=False, index=True)
+    user_email = Column(String, nullable=False)
     action = Column(String, nullable=False)
     details = Column(Text, nullable=False)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = (
+        # Keyset pagination over one user's feed; also serves lookups by user
+        Index("ix_activity_logs_user_timestamp", "user_email", "timestamp", "id"),
+    )
+
+class ActivityDaily(Base):
+    """Per-day activity counts kept after raw rows leave the retention window."""
+    __tablename__ = "activity_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    user_email = Column(String, nullable=False)
+    action = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "user_email", "action", name="uq_activity_daily"),
+    )
+
+
 
+class BotContext(Base):
+    """Persisted bot conversation context, reloaded when not in memory."""
+    __tablename__ = "bot_contexts"
 
+    user_email = Column(String, primary_key=True)
+    data = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
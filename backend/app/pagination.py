@@ -0,0 +1,43 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> Tuple[str, int]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    key, row_id = raw.rsplit("|", 1)
+    return key, int(row_id)
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque cursor string."""
+    return _encode(f"{timestamp.isoformat()}|{row_id}")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """Decode a cursor produced by encode_cursor, or return None if it is malformed."""
+    try:
+        timestamp, row_id = _decode(cursor)
+        return datetime.fromisoformat(timestamp), row_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def encode_score_cursor(score: float, row_id: int) -> str:
+    """Encode a (relevance score, id) keyset position as an opaque cursor string."""
+    return _encode(f"{score!r}|{row_id}")
+
+
+def decode_score_cursor(cursor: str) -> Optional[Tuple[float, int]]:
+    """Decode a cursor produced by encode_score_cursor, or return None if it is malformed."""
+    try:
+        score, row_id = _decode(cursor)
+        return float(score), row_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
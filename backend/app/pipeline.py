@@ -0,0 +1,161 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+from sqlalchemy import insert
+from .config import settings
+from .database import AsyncSessionLocal
+from .metrics import percentiles_ms
+from .models import Message, MessageStatus
+from . import conversations
+
+
+@dataclass
+class StoredMessage:
+    """A committed message as returned by the write pipeline."""
+    id: int
+    sender: str
+    recipient: str
+    content: str
+    timestamp: datetime
+    status: MessageStatus
+    is_bot_response: bool
+    recipient_unread: int
+
+
+@dataclass
+class _WriteJob:
+    sender: str
+    recipient: str
+    content: str
+    status: MessageStatus
+    is_bot_response: bool
+    future: asyncio.Future
+    submitted_at: float
+
+
+class MessageWritePipeline:
+    """Group-commits concurrent message writes.
+
+    Each submitted message waits at most ``max_latency`` seconds for other
+    sends to join its batch. A batch is written in one transaction: the
+    messages are inserted with RETURNING and their conversation summaries
+    are applied before a single commit.
+    """
+
+    def __init__(self, max_batch: int, max_latency: float, window: int = 10000):
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.batches = 0
+        self.messages = 0
+
+    async def submit(
+        self,
+        sender: str,
+        recipient: str,
+        content: str,
+        status: MessageStatus = MessageStatus.SENT,
+        is_bot_response: bool = False,
+    ) -> StoredMessage:
+        """Queue a message for the next batch and wait until it is committed."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            # A fresh context: the shared worker must not inherit the
+            # request-scoped state of whichever caller happened to start it
+            self._worker = asyncio.create_task(self._run(), context=contextvars.Context())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_WriteJob(
+            sender, recipient, content, status, is_bot_response,
+            future, time.perf_counter()
+        ))
+        return await future
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_latency > 0:
+                await asyncio.sleep(self.max_latency)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write(batch)
+            except Exception:
+                # Retry one by one so a single bad row does not fail its neighbours
+                for job in batch:
+                    try:
+                        await self._write([job])
+                    except Exception as exc:
+                        if not job.future.done():
+                            job.future.set_exception(exc)
+
+    async def _write(self, batch: List[_WriteJob]) -> None:
+        # Stamped here like every other write path: a server default would be
+        # stored in a different format and break keyset comparisons on SQLite
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                insert(Message).returning(
+                    Message.id, Message.timestamp, sort_by_parameter_order=True
+                ),
+                [{
+                    "sender": job.sender,
+                    "recipient": job.recipient,
+                    "content": job.content,
+                    "timestamp": now,
+                    "status": job.status,
+                    "is_bot_response": job.is_bot_response,
+                } for job in batch]
+            )
+            rows = result.all()
+
+            unread = await conversations.record_messages(db, [
+                (job.sender, job.recipient, row.id, job.status != MessageStatus.READ)
+                for job, row in zip(batch, rows)
+            ])
+
+            await db.commit()
+
+        done = time.perf_counter()
+        self.batches += 1
+        self.messages += len(batch)
+        for job, row in zip(batch, rows):
+            self._latencies.append(done - job.submitted_at)
+            if not job.future.done():
+                job.future.set_result(StoredMessage(
+                    id=row.id,
+                    sender=job.sender,
+                    recipient=job.recipient,
+                    content=job.content,
+                    timestamp=row.timestamp,
+                    status=job.status,
+                    is_bot_response=job.is_bot_response,
+                    recipient_unread=unread[(job.recipient, job.sender)],
+                ))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "messages": self.messages,
+            "avg_batch_size": round(self.messages / self.batches, 2) if self.batches else 0.0,
+            **percentiles_ms(self._latencies, "ack_latency"),
+        }
+
+
+message_pipeline = MessageWritePipeline(
+    settings.WRITE_BATCH_MAX_SIZE, settings.WRITE_BATCH_MAX_LATENCY_MS / 1000
+)
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+from .broker import ChannelMixin
+from .config import settings
+
+
+class PresenceRegistry:
+    """Knows which users have a live socket on this worker or any other.
+
+    Each user's local Socket.IO sessions are tracked individually, so a user
+    with several tabs stays online until the last one closes. When the
+    Socket.IO manager links several workers, each one announces its users
+    going online/offline and answers snapshot requests, so ``is_online``
+    stays a dictionary lookup with no cross-process round-trip. Where the
+    manager cannot tell when a worker dies (Redis), every worker re-sends
+    its snapshot as a heartbeat and workers that fall silent are dropped.
+    """
+
+    def __init__(self):
+        self._local: Dict[str, Set[str]] = {}  # user -> local session ids
+        self._last_seen: Dict[str, float] = {}  # user -> epoch seconds
+        self._remote: Dict[str, Set[str]] = {}  # host_id -> online users
+        self._remote_hosts: Dict[str, int] = defaultdict(int)  # user -> hosts with it online
+        self._heard: Dict[str, float] = {}  # host_id -> epoch seconds of its last snapshot
+        self._broker: Optional[ChannelMixin] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def attach(self, manager) -> None:
+        if not isinstance(manager, ChannelMixin):
+            return
+        self._broker = manager
+        manager.subscribe("presence", self._on_presence)
+        manager.subscribe("presence_snapshot", self._on_snapshot)
+        manager.subscribe("presence_hello", self._on_hello)
+        manager.subscribe("host_down", self._on_host_down)
+        manager.on_connect(self._on_broker_connect)
+
+    def is_online(self, user: str) -> bool:
+        return user in self._local or user in self._remote_hosts
+
+    def session_count(self, user: str) -> int:
+        """Sessions this worker holds for user."""
+        return len(self._local.get(user, ()))
+
+    def last_seen(self, user: str) -> Optional[datetime]:
+        """When user was last online; now if they still are."""
+        if self.is_online(user):
+            return datetime.now(timezone.utc)
+        seen = self._last_seen.get(user)
+        return datetime.fromtimestamp(seen, timezone.utc) if seen is not None else None
+
+    def query(self, users: Iterable[str]) -> Dict[str, dict]:
+        """Batched presence lookup for many users at once."""
+        result = {}
+        for user in users:
+            seen = self.last_seen(user)
+            result[user] = {
+                "online": self.is_online(user),
+                "last_seen": seen.isoformat() if seen else None,
+            }
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._local),
+            "sessions": sum(len(sessions) for sessions in self._local.values()),
+            "remote_users": len(self._remote_hosts),
+        }
+
+    async def connect(self, user: str, sid: str) -> None:
+        sessions = self._local.setdefault(user, set())
+        sessions.add(sid)
+        if len(sessions) == 1:
+            await self._announce(user, True)
+
+    async def disconnect(self, user: str, sid: str) -> None:
+        sessions = self._local.get(user)
+        if sessions is None:
+            return
+        sessions.discard(sid)
+        if not sessions:
+            del self._local[user]
+            self._last_seen[user] = time.time()
+            await self._announce(user, False)
+
+    async def _announce(self, user: str, online: bool) -> None:
+        if self._broker is not None:
+            await self._broker.publish("presence", {"user": user, "online": online, "at": time.time()})
+
+    def _set_remote(self, host_id: str, user: str, online: bool) -> None:
+        users = self._remote.setdefault(host_id, set())
+        if online and user not in users:
+            users.add(user)
+            self._remote_hosts[user] += 1
+        elif not online and user in users:
+            users.discard(user)
+            self._remote_hosts[user] -= 1
+            if self._remote_hosts[user] <= 0:
+                del self._remote_hosts[user]
+
+    def _drop_host(self, host_id: str) -> None:
+        now = time.time()
+        for user in list(self._remote.get(host_id, ())):
+            self._set_remote(host_id, user, False)
+            self._last_seen[user] = now
+        self._remote.pop(host_id, None)
+        self._heard.pop(host_id, None)
+
+    async def _on_presence(self, data: dict) -> None:
+        self._set_remote(data["host_id"], data["user"], data["online"])
+        self._heard[data["host_id"]] = time.time()
+        if not data["online"]:
+            self._last_seen[data["user"]] = data.get("at", time.time())
+
+    async def _on_snapshot(self, data: dict) -> None:
+        self._drop_host(data["host_id"])
+        self._heard[data["host_id"]] = time.time()
+        for user in data["users"]:
+            self._set_remote(data["host_id"], user, True)
+
+    async def _on_hello(self, data: dict) -> None:
+        await self._broker.publish("presence_snapshot", {"users": list(self._local)})
+
+    async def _on_host_down(self, data: dict) -> None:
+        self._drop_host(data["host_id"])
+
+    async def _on_broker_connect(self) -> None:
+        # After joining (or re-joining) the hub, rebuild the remote view from scratch
+        for host_id in list(self._remote):
+            self._drop_host(host_id)
+        await self._broker.publish("presence_hello", {})
+        await self._broker.publish("presence_snapshot", {"users": list(self._local)})
+        if not self._broker.announces_host_down and self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def _heartbeat_loop(self) -> None:
+        interval = settings.PRESENCE_HEARTBEAT_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            self.expire_silent_hosts(time.time() - 3 * interval)
+            try:
+                await self._broker.publish("presence_snapshot", {"users": list(self._local)})
+            except Exception as e:
+                print(f"Warning: presence heartbeat failed: {e}")
+
+    def expire_silent_hosts(self, cutoff: float) -> None:
+        """Forget workers whose last snapshot is older than cutoff."""
+        for host_id, heard in list(self._heard.items()):
+            if heard < cutoff:
+                self._drop_host(host_id)
+
+
+presence = PresenceRegistry()
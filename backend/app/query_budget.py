@@ -0,0 +1,223 @@
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .config import settings
+from .database import async_engine, async_writer_engine, engine
+
+MODES = ("off", "warn", "raise")
+if settings.QUERY_BUDGET_MODE not in MODES:
+    raise ValueError(f"Unknown QUERY_BUDGET_MODE: {settings.QUERY_BUDGET_MODE}")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\([?, ]+\))(?:\s*,\s*\1)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize(statement: str) -> str:
+    """Reduce a statement to its shape: literals and parameters become ``?``,
+    expanded IN lists and multi-row VALUES collapse to one entry."""
+    shape = _STRING.sub("?", statement)
+    shape = _PARAM.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _ROWS.sub(r"\1, ...", shape)
+    shape = _IN_LIST.sub("(?, ...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryTracker:
+    """Queries run while one HTTP request, socket event or test block is active."""
+
+    def __init__(self, label: Union[str, Callable[[], str]], limit: Optional[int] = None,
+                 enforce: bool = False, budgeted: bool = False):
+        self._label = label
+        self._limit = limit
+        self.enforce = enforce
+        self.budgeted = budgeted
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Dict[str, List[float]] = {}  # normalized SQL -> [count, seconds]
+        self.closed = False
+
+    @property
+    def label(self) -> str:
+        # HTTP labels depend on the matched route, which is only known once
+        # routing has run, so they are resolved on first use
+        if callable(self._label):
+            self._label = self._label()
+        return self._label
+
+    @property
+    def limit(self) -> Optional[int]:
+        if self._limit is None and self.budgeted:
+            self._limit = budget_for(self.label)
+        return self._limit
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        entry = self.statements.setdefault(normalize(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def worst(self, n: int = 5) -> List[Tuple[str, int, float]]:
+        """Statements ordered by how often they ran, then by total time."""
+        ranked = sorted(self.statements.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)
+        return [(sql, int(count), seconds) for sql, (count, seconds) in ranked[:n]]
+
+    def repeated(self) -> List[Tuple[str, int, float]]:
+        return [entry for entry in self.worst(len(self.statements)) if entry[1] >= settings.QUERY_REPEAT_LIMIT]
+
+    def report(self, n: int = 5) -> str:
+        lines = [f"{self.label}: {self.count} queries, {self.seconds * 1000:.1f} ms"]
+        for sql, count, seconds in self.worst(n):
+            lines.append(f"  {count:>4}x {seconds * 1000:8.2f} ms  {sql}")
+        return "\n".join(lines)
+
+
+_active: ContextVar[Tuple[QueryTracker, ...]] = ContextVar("query_trackers", default=())
+
+
+_counts = {"scopes": 0, "over_budget": 0, "repeated": 0}
+
+
+def stats() -> Dict[str, int]:
+    return dict(_counts)
+
+
+def watch_engine(db_engine: Engine) -> None:
+    """Attribute every statement db_engine runs to the trackers active in the caller's context."""
+
+    @event.listens_for(db_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        trackers = _active.get()
+        if not trackers:
+            return
+        for tracker in trackers:
+            if tracker.enforce and not tracker.closed and tracker.limit is not None and tracker.count >= tracker.limit:
+                _counts["over_budget"] += 1
+                raise QueryBudgetExceeded(
+                    f"{tracker.label} exceeded its budget of {tracker.limit} queries\n{tracker.report()}"
+                )
+        conn.info.setdefault("budget_started", []).append(time.perf_counter())
+
+    @event.listens_for(db_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        trackers = _active.get()
+        if not trackers:
+            return
+        elapsed = time.perf_counter() - conn.info["budget_started"].pop()
+        for tracker in trackers:
+            # Background workers inherit the context they were started from;
+            # a scope that has ended no longer collects their queries
+            if not tracker.closed:
+                tracker.record(statement, elapsed)
+
+    @event.listens_for(db_engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("budget_started") if context.connection is not None else None
+        if started and _active.get():
+            started.pop()
+
+
+@contextmanager
+def track(label: Union[str, Callable[[], str]], limit: Optional[int] = None,
+          enforce: bool = False, budgeted: bool = False) -> Iterator[QueryTracker]:
+    """Collect the queries run in this context (and tasks started from it) until the block ends."""
+    tracker = QueryTracker(label, limit, enforce, budgeted)
+    token = _active.set(_active.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        tracker.closed = True
+        _active.reset(token)
+
+
+@contextmanager
+def exempt() -> Iterator[None]:
+    """Run a block outside every active tracker, for work whose query count grows with its input by design."""
+    token = _active.set(())
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def budget_for(label: str) -> int:
+    return settings.QUERY_BUDGETS.get(label, settings.QUERY_BUDGET_DEFAULT)
+
+
+def check(tracker: QueryTracker) -> None:
+    """Warn about a finished scope that went over budget or repeated a statement."""
+    _counts["scopes"] += 1
+    limit = tracker.limit
+    repeated = tracker.repeated()
+    if tracker.count > limit:
+        _counts["over_budget"] += 1
+        print(f"Warning: query budget of {limit} exceeded\n{tracker.report()}")
+    elif repeated:
+        _counts["repeated"] += 1
+        sql, count, _ = repeated[0]
+        print(f"Warning: possible N+1 in {tracker.label}: {count}x {sql}\n{tracker.report()}")
+
+
+@contextmanager
+def scope(label: Union[str, Callable[[], str]]) -> Iterator[Optional[QueryTracker]]:
+    """Budgeted scope for one request or socket event; a no-op when QUERY_BUDGET_MODE is off.
+
+    In ``raise`` mode the query that would go over budget raises
+    QueryBudgetExceeded instead of running.
+    """
+    if settings.QUERY_BUDGET_MODE == "off":
+        yield None
+        return
+    with track(label, enforce=settings.QUERY_BUDGET_MODE == "raise", budgeted=True) as tracker:
+        yield tracker
+    check(tracker)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "block") -> Iterator[QueryTracker]:
+    """Test helper: fail if the block runs more than limit queries.
+
+    Works for direct calls and in-process HTTP requests alike, e.g.::
+
+        with assert_max_queries(2, "GET /users"):
+            await client.get("/users", headers=auth)
+
+    and stays at 2 however many users exist.
+    """
+    with track(label) as tracker:
+        yield tracker
+    if tracker.count > limit:
+        raise AssertionError(f"expected at most {limit} queries\n{tracker.report(10)}")
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware running each HTTP request in its own budgeted scope."""
+
+    def __init__(self, app, label: Callable[[dict], str]):
+        self.app = app
+        self.label = label
+
+    async def __call__(self, scope_, receive, send):
+        if scope_["type"] != "http":
+            return await self.app(scope_, receive, send)
+        with scope(lambda: self.label(scope_)):
+            await self.app(scope_, receive, send)
+
+
+for _engine in {engine, async_engine.sync_engine, async_writer_engine.sync_engine}:
+    watch_engine(_engine)
@@ -0,0 +1,123 @@
+import time
+from typing import Dict, Optional, Sequence, Tuple
+from .config import settings
+
+ALLOW, THROTTLE, DISCONNECT = "allow", "throttle", "disconnect"
+
+DEFAULT_GROUP = "*"
+
+
+class TokenBucket:
+    """``burst`` tokens, refilled continuously at ``rate`` per second."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class EventLimiter:
+    """Per-user token buckets for inbound Socket.IO events.
+
+    Events named in ``limits`` get a bucket of their own, every other event
+    draws from a shared one. A user's sessions on this worker share the
+    buckets, so opening more tabs does not raise the limit. Each session also
+    has a tolerance bucket that throttled events drain and that refills at one
+    per second; a session that empties it has stayed over its limit and is
+    disconnected.
+    """
+
+    def __init__(self, rate: float, burst: int, limits: Dict[str, Sequence[float]], tolerance: int):
+        self.rate = rate
+        self.burst = burst
+        self.limits: Dict[str, Tuple[float, float]] = {event: (float(r), float(b)) for event, (r, b) in limits.items()}
+        self.tolerance = tolerance
+        self._users: Dict[str, str] = {}  # sid -> user
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._sessions: Dict[str, int] = {}  # user -> sessions on this worker
+        self._penalties: Dict[str, TokenBucket] = {}
+        self._counts = {"allowed": 0, "throttled": 0, "disconnected": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def connect(self, sid: str, user: str) -> None:
+        self._users[sid] = user
+        self._sessions[user] = self._sessions.get(user, 0) + 1
+
+    def disconnect(self, sid: str) -> None:
+        user = self._users.pop(sid, None)
+        self._penalties.pop(sid, None)
+        if user is None:
+            return
+        remaining = self._sessions.get(user, 1) - 1
+        if remaining > 0:
+            self._sessions[user] = remaining
+            return
+        # Buckets of users gone from this worker are dropped; they start full on return
+        del self._sessions[user]
+        self._buckets.pop((user, DEFAULT_GROUP), None)
+        for event in self.limits:
+            self._buckets.pop((user, event), None)
+
+    def _bucket(self, user: str, event: str) -> Optional[TokenBucket]:
+        group = event if event in self.limits else DEFAULT_GROUP
+        bucket = self._buckets.get((user, group))
+        if bucket is None:
+            rate, burst = self.limits.get(group, (self.rate, self.burst))
+            if rate <= 0:
+                return None
+            bucket = self._buckets[(user, group)] = TokenBucket(rate, burst)
+        return bucket
+
+    def check(self, sid: str, event: str) -> str:
+        """ALLOW, THROTTLE (drop this event) or DISCONNECT (drop the session)."""
+        user = self._users.get(sid)
+        if user is None:
+            return ALLOW
+        bucket = self._bucket(user, event)
+        now = time.monotonic()
+        if bucket is None or bucket.take(now):
+            self._counts["allowed"] += 1
+            return ALLOW
+        self._counts["throttled"] += 1
+        if self.tolerance <= 0:
+            return THROTTLE
+        penalty = self._penalties.get(sid)
+        if penalty is None:
+            penalty = self._penalties[sid] = TokenBucket(1.0, self.tolerance)
+        if penalty.take(now):
+            return THROTTLE
+        self._counts["disconnected"] += 1
+        return DISCONNECT
+
+    def retry_after(self, sid: str, event: str) -> float:
+        """Seconds until the bucket ``event`` draws from has a token again."""
+        user = self._users.get(sid)
+        bucket = self._bucket(user, event) if user is not None else None
+        if bucket is None or bucket.tokens >= 1:
+            return 0.0
+        return round((1 - bucket.tokens) / bucket.rate, 3)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counts, "sessions": len(self._users), "buckets": len(self._buckets)}
+
+
+event_limiter = EventLimiter(
+    settings.SOCKET_EVENT_RATE,
+    settings.SOCKET_EVENT_BURST,
+    settings.SOCKET_EVENT_LIMITS,
+    settings.SOCKET_THROTTLE_TOLERANCE,
+)
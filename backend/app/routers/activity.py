@@ -1,21 +1,138 @@
-from fastapi import APIRouter, Depends
-from typing import List
-from sqlalchemy.orm import Session
-from ..schemas import ActivityOut
-from ..deps import get_current_user
-from ..database import get_db_session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..schemas import ActivityPage
+from ..deps import get_admin_user, get_current_user
+from ..database import AsyncSessionLocal, get_db_session
 from ..models import ActivityLog
+from ..config import settings
+from ..pagination import encode_cursor, decode_cursor
+from ..wire import dumps, json_response
+from .. import query_budget
+from datetime import datetime, timezone
 
 router = APIRouter()
 
-@router.get("", response_model=List[ActivityOut])
+COLUMNS = (ActivityLog.id, ActivityLog.user_email, ActivityLog.action, ActivityLog.details, ActivityLog.timestamp)
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored in UTC; naive query values are taken as UTC too
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _filters(
+    user: Optional[str],
+    actions: Optional[List[str]],
+    since: Optional[datetime],
+    until: Optional[datetime],
+) -> list:
+    """WHERE clauses for a feed: since is inclusive, until exclusive."""
+    filters = []
+    if user is not None:
+        filters.append(ActivityLog.user_email == user)
+    if actions:
+        filters.append(ActivityLog.action.in_(actions))
+    if since is not None:
+        filters.append(ActivityLog.timestamp >= _utc(since))
+    if until is not None:
+        filters.append(ActivityLog.timestamp < _utc(until))
+    return filters
+
+def _beyond(position: Tuple[datetime, int], newer: bool):
+    timestamp, row_id = position
+    if newer:
+        return or_(
+            ActivityLog.timestamp > timestamp,
+            and_(ActivityLog.timestamp == timestamp, ActivityLog.id > row_id)
+        )
+    return or_(
+        ActivityLog.timestamp < timestamp,
+        and_(ActivityLog.timestamp == timestamp, ActivityLog.id < row_id)
+    )
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    position = decode_cursor(cursor)
+    if position is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return position
+
+@router.get("", response_model=ActivityPage)
 async def get_activity_logs(
+    action: Optional[List[str]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    before: Optional[str] = None,
+    limit: int = Query(settings.ACTIVITY_PAGE_SIZE, ge=1, le=settings.ACTIVITY_PAGE_MAX),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_db_session)
 ):
-    # Get recent activity logs
-    logs = db.query(ActivityLog).order_by(ActivityLog.timestamp.desc()).limit(50).all()
-    
-    return logs
+    """The caller's own activity, newest first.
 
+    Filter with one or more ``action`` values and a ``since``/``until`` range;
+    pass ``next_cursor`` back as ``before`` for older entries. Each page is a
+    range scan on ix_activity_logs_user_timestamp.
+    """
+    position = _parse_cursor(before)
+    query = select(*COLUMNS).where(*_filters(current_user, action, since, until))
+    if position is not None:
+        query = query.where(_beyond(position, newer=False))
+    result = await db.execute(
+        query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc()).limit(limit + 1)
+    )
+    rows = [dict(row._mapping) for row in result]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return json_response({"activity": rows, "next_cursor": next_cursor})
+
+async def _export_chunks(filters: list) -> AsyncIterator[bytes]:
+    """Newline-delimited JSON, oldest first, one short keyset query per chunk.
+
+    A session is only held while a chunk is read, so a slow download never
+    pins a connection or a long-running transaction.
+    """
+    chunk = settings.ACTIVITY_EXPORT_CHUNK
+    position = None
+    while True:
+        query = select(*COLUMNS).where(*filters)
+        if position is not None:
+            query = query.where(_beyond(position, newer=True))
+        query = query.order_by(ActivityLog.timestamp.asc(), ActivityLog.id.asc()).limit(chunk)
+        # The number of chunks grows with the range, not with a defect
+        with query_budget.exempt():
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(query)).all()
+        if not rows:
+            return
+        yield b"".join(dumps(dict(row._mapping)) + b"\n" for row in rows)
+        if len(rows) < chunk:
+            return
+        position = rows[-1].timestamp, rows[-1].id
+
+@router.get("/export")
+async def export_activity_logs(
+    user: Optional[str] = None,
+    action: Optional[List[str]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    admin: str = Depends(get_admin_user)
+):
+    """Admin only: stream every matching entry, across all users unless ``user`` is given.
 
+    Rows are sent as they are read, oldest first, so any range can be
+    exported in constant memory.
+    """
+    filters = _filters(user, action, since, until)
+    return StreamingResponse(_export_chunks(filters), media_type="application/x-ndjson")
@@ -1,17 +1,25 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..schemas import UserCreate, UserLogin, UserOut, Token
-from ..security import verify_password, get_password_hash, create_access_token
+from ..security import HashingPoolSaturated, create_access_token, password_hasher
 from ..database import get_db_session
 from ..models import User
 
 router = APIRouter()
 
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/register", response_model=UserOut)
-async def register(user_data: UserCreate, db: Session = Depends(get_db_session)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db_session)):
     try:
         # Check if user already exists
-        existing_user = db.query(User).filter(User.email == user_data.email).first()
+        existing_user = await db.scalar(select(User).where(User.email == user_data.email))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -19,17 +27,22 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db_session))
             )
         
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        try:
+            hashed_password = await password_hasher.hash(user_data.password)
+        except HashingPoolSaturated:
+            raise _busy()
         user = User(
             email=user_data.email,
             hashed_password=hashed_password
         )
         
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         
         return user
+    except HTTPException:
+        raise
     except ValueError as e:
         # Handle Pydantic validation errors
         raise HTTPException(
@@ -43,9 +56,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db_session))
         )
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db_session)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db_session)):
     # Find user by email
-    user = db.query(User).filter(User.email == user_data.email).first()
+    user = await db.scalar(select(User).where(User.email == user_data.email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -53,11 +66,22 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db_session)):
         )
     
     # Verify password
-    if not verify_password(user_data.password, user.hashed_password):
+    try:
+        verified, new_hash = await password_hasher.verify_and_update(
+            user_data.password, user.hashed_password
+        )
+    except HashingPoolSaturated:
+        raise _busy()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
+
+    # Upgrade hashes made with an older work factor
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     
     # Create access token
     access_token = create_access_token(data={"sub": user_data.email})
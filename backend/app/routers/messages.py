@@ -1,35 +1,160 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from sqlalchemy.orm import Session
-from ..schemas import MessageCreate, MessageOut
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..schemas import MessageCreate, MessageOut, MessagePage, SearchPage
 from ..deps import get_current_user
 from ..database import get_db_session
-from ..models import Message, MessageStatus, ActivityLog
+from ..models import Message, MessageStatus
 from ..config import settings
-from ..bot import bot
+from ..bot_pool import bot_pool
+from ..sio import sio
+from ..pagination import encode_cursor, decode_cursor, encode_score_cursor, decode_score_cursor
+from ..search import UnsupportedBackend, search_messages
+from ..wire import json_response, message_to_wire
+from .. import archive, conversations
+from ..activity_sink import activity_sink
 from datetime import datetime, timezone
 
 router = APIRouter()
 
-@router.get("", response_model=List[MessageOut])
+async def _fetch_direction(
+    db: AsyncSession,
+    sender: str,
+    recipient: str,
+    position: Optional[Tuple[datetime, int]],
+    newer: bool,
+    limit: int,
+) -> List[Message]:
+    """Fetch one side of a conversation relative to a keyset position."""
+    query = select(Message).where(
+        Message.sender == sender,
+        Message.recipient == recipient
+    )
+    if position is not None:
+        timestamp, row_id = position
+        if newer:
+            query = query.where(or_(
+                Message.timestamp > timestamp,
+                and_(Message.timestamp == timestamp, Message.id > row_id)
+            ))
+        else:
+            query = query.where(or_(
+                Message.timestamp < timestamp,
+                and_(Message.timestamp == timestamp, Message.id < row_id)
+            ))
+    if newer:
+        query = query.order_by(Message.timestamp.asc(), Message.id.asc())
+    else:
+        query = query.order_by(Message.timestamp.desc(), Message.id.desc())
+    result = await db.execute(query.limit(limit))
+    return list(result.scalars().all())
+
+@router.get("", response_model=MessagePage)
 async def get_messages(
     peer: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(settings.MESSAGES_PAGE_SIZE, ge=1, le=settings.MESSAGES_PAGE_MAX),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_db_session)
 ):
-    # Get messages between current user and peer
-    messages = db.query(Message).filter(
-        ((Message.sender == current_user) & (Message.recipient == peer)) |
-        ((Message.sender == peer) & (Message.recipient == current_user))
-    ).order_by(Message.timestamp.asc()).all()
-    
-    return messages
+    """Get one page of the conversation with peer, oldest message first.
+
+    Without a cursor the latest page is returned. Pass ``next_cursor`` back as
+    ``before`` to scroll further into history, or as ``after`` to page forward.
+    """
+    if before and after:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either 'before' or 'after', not both"
+        )
+
+    position = None
+    cursor = before or after
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    newer = after is not None
+
+    # Each direction is a bounded range scan on ix_messages_pair_timestamp, so
+    # the page cost does not depend on how long the history is.
+    messages = await _fetch_direction(db, current_user, peer, position, newer, limit + 1)
+    if peer != current_user:
+        messages += await _fetch_direction(db, peer, current_user, position, newer, limit + 1)
+    messages.sort(key=lambda m: (m.timestamp, m.id), reverse=not newer)
+
+    # Past the hot window the rest of the history lives in archive segments.
+    # A full page whose boundary row is still hot cannot be affected by them.
+    if newer:
+        reaches_archive = position is None or not archive.is_hot(position[0])
+    else:
+        reaches_archive = len(messages) <= limit or not archive.is_hot(messages[limit].timestamp)
+    if reaches_archive:
+        messages += await archive.fetch_archived(db, current_user, peer, position, newer, limit + 1)
+        messages.sort(key=lambda m: (m.timestamp, m.id), reverse=not newer)
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    next_cursor = None
+    if has_more:
+        edge = messages[-1]
+        next_cursor = encode_cursor(edge.timestamp, edge.id)
+    if not newer:
+        messages.reverse()
+
+    return json_response({
+        "messages": [message_to_wire(m) for m in messages],
+        "next_cursor": next_cursor,
+    })
+
+@router.get("/search", response_model=SearchPage)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=settings.MESSAGES_PAGE_MAX),
+    current_user: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Search the caller's conversations, best match first.
+
+    Every word of ``q`` must appear (the last one may be a prefix). Pass
+    ``next_cursor`` back as ``cursor`` for the next page. Archived messages
+    are not indexed: when archival is on, ``searched_since`` says how far
+    back the results can reach.
+    """
+    position = None
+    if cursor:
+        position = decode_score_cursor(cursor)
+        if position is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    try:
+        hits = await search_messages(db, current_user, q, position, limit + 1)
+    except UnsupportedBackend as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_score_cursor(hits[-1].score, hits[-1].id)
+    return json_response({
+        "results": [{**message_to_wire(hit), "snippet": hit.snippet} for hit in hits],
+        "next_cursor": next_cursor,
+        "searched_since": archive.hot_since(),
+    })
 
 @router.post("", response_model=MessageOut)
 async def create_message(
     message_data: MessageCreate,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_db_session)
 ):
     # Validate recipient
     if message_data.recipient != settings.BOT_IDENTIFIER:
@@ -49,21 +174,24 @@ async def create_message(
     )
     
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.flush()
+    await conversations.record_message(db, message)
+    # The commit hands the writer connection back; nothing is reloaded, so
+    # the session holds no connection while the bot reply is generated
+    await db.commit()
     
     # Log activity for message sent
-    activity = ActivityLog(
-        user_email=current_user,
-        action="message_sent",
-        details=f"{current_user} sent a message to {message_data.recipient}: {message_data.content[:50]}",
-        timestamp=datetime.now(timezone.utc)
+    await activity_sink.record(
+        current_user,
+        "message_sent",
+        f"{current_user} sent a message to {message_data.recipient}: {message_data.content[:50]}"
     )
-    db.add(activity)
     
     # If message is to bot, generate and save bot response
     if message_data.recipient == settings.BOT_IDENTIFIER:
-        bot_response = bot.get_response(message_data.content)
+        user_room = f"user:{current_user}"
+        await sio.emit("typing", {"peer": settings.BOT_IDENTIFIER, "typing": True}, room=user_room)
+        bot_response = await bot_pool.reply(current_user, message_data.content)
         bot_message = Message(
             sender=settings.BOT_IDENTIFIER,
             recipient=current_user,
@@ -72,18 +200,19 @@ async def create_message(
             is_bot_response=True
         )
         db.add(bot_message)
+        await db.flush()
+        await conversations.record_message(db, bot_message)
+        
+        await db.commit()
+        await sio.emit("typing", {"peer": settings.BOT_IDENTIFIER, "typing": False}, room=user_room)
         
         # Log bot activity
-        bot_activity = ActivityLog(
-            user_email=settings.BOT_IDENTIFIER,
-            action="bot_response",
-            details=f"Bot responded to {current_user}: {bot_response[:50]}",
-            timestamp=datetime.now(timezone.utc)
+        await activity_sink.record(
+            settings.BOT_IDENTIFIER,
+            "bot_response",
+            f"Bot responded to {current_user}: {bot_response[:50]}"
         )
-        db.add(bot_activity)
-    
-    db.commit()
     
-    return message
+    return json_response(message_to_wire(message))
 
 
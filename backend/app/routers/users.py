@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..schemas import UserOut, UserInbox
 from ..deps import get_current_user
 from ..database import get_db_session
-from ..models import User, Message, MessageStatus
+from ..models import User, Conversation
+from ..presence import presence
+from ..wire import json_response
 from typing import List
 
 router = APIRouter()
@@ -11,9 +14,9 @@ router = APIRouter()
 @router.get("/me", response_model=UserOut)
 async def get_current_user_info(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_db_session)
 ):
-    user = db.query(User).filter(User.email == current_user).first()
+    user = await db.scalar(select(User).where(User.email == current_user))
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -23,18 +26,37 @@ async def get_current_user_info(
 @router.get("", response_model=List[UserInbox])
 async def get_users(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db_session)
+    db: AsyncSession = Depends(get_db_session)
 ):
-    """Get all users for the inbox (excluding current user) with unread counts"""
-    users = db.query(User).filter(User.email != current_user).all()
-    result: List[UserInbox] = []
-    for u in users:
-        unread = db.query(Message).filter(
-            Message.sender == u.email,
-            Message.recipient == current_user,
-            Message.status != MessageStatus.READ
-        ).count()
-        result.append(UserInbox(email=u.email, unread=unread))
-    return result
-
-
+    """Get all users for the inbox (excluding current user) with unread counts, most recent chats first"""
+    conversation_join = or_(
+        and_(Conversation.user_a == current_user, Conversation.user_b == User.email),
+        and_(Conversation.user_b == current_user, Conversation.user_a == User.email)
+    )
+    unread = case(
+        (Conversation.user_a == current_user, Conversation.unread_a),
+        else_=Conversation.unread_b
+    )
+    result = await db.execute(
+        select(
+            User.email,
+            func.coalesce(unread, 0),
+            Conversation.last_activity
+        ).outerjoin(Conversation, conversation_join).where(
+            User.email != current_user
+        ).order_by(
+            Conversation.last_activity.desc().nulls_last(),
+            User.email.asc()
+        )
+    )
+    rows = result.all()
+    return json_response([
+        {
+            "email": email,
+            "unread": unread_count,
+            "last_activity": last_activity,
+            "online": presence.is_online(email),
+            "last_seen": presence.last_seen(email),
+        }
+        for email, unread_count, last_activity in rows
+    ])
@@ -42,6 +42,9 @@ class UserOut(BaseModel):
 class UserInbox(BaseModel):
     email: str
     unread: int
+    last_activity: Optional[datetime] = None
+    online: bool = False
+    last_seen: Optional[datetime] = None
 
 class MessageCreate(BaseModel):
     recipient: str
@@ -75,6 +78,22 @@ class ActivityOut(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+class ActivityPage(BaseModel):
+    activity: List[ActivityOut]
+    next_cursor: Optional[str] = None
+
+class MessagePage(BaseModel):
+    messages: List[MessageOut]
+    next_cursor: Optional[str] = None
+
+class SearchHit(MessageOut):
+    snippet: str
+
+class SearchPage(BaseModel):
+    results: List[SearchHit]
+    next_cursor: Optional[str] = None
+    searched_since: Optional[datetime] = None  # older messages may be archived and are not searched
+
 class MessagesResponse(BaseModel):
     messages: List[MessageOut]
     total: int
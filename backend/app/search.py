@@ -0,0 +1,167 @@
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import Float, String, column, text
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import Message
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_WORDS = 12
+
+# Search terms are reduced to plain words so user input can never be
+# parsed as query syntax
+TERM = re.compile(r"\w+", re.UNICODE)
+
+# SQLite: an FTS5 index over messages. Its external content is a view that
+# adds each message's participants as hex tokens, so "messages of this user
+# containing these words" is answered inside the index. Triggers keep it in
+# step with every write path, including bulk inserts.
+SQLITE_DDL = [
+    """CREATE VIEW IF NOT EXISTS messages_fts_source AS
+       SELECT id, content, hex(sender) || ' ' || hex(recipient) AS participants FROM messages""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+       content, participants, content='messages_fts_source', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+       INSERT INTO messages_fts(rowid, content, participants)
+       VALUES (new.id, new.content, hex(new.sender) || ' ' || hex(new.recipient));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+       INSERT INTO messages_fts(messages_fts, rowid, content, participants)
+       VALUES ('delete', old.id, old.content, hex(old.sender) || ' ' || hex(old.recipient));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_update
+       AFTER UPDATE OF content, sender, recipient ON messages BEGIN
+       INSERT INTO messages_fts(messages_fts, rowid, content, participants)
+       VALUES ('delete', old.id, old.content, hex(old.sender) || ' ' || hex(old.recipient));
+       INSERT INTO messages_fts(rowid, content, participants)
+       VALUES (new.id, new.content, hex(new.sender) || ' ' || hex(new.recipient));
+       END""",
+]
+
+# PostgreSQL: a GIN index on the message text; queries must use the same
+# expression for the planner to pick it
+TS_VECTOR = "to_tsvector('simple', content)"
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_messages_content_tsv ON messages USING gin ({TS_VECTOR})",
+]
+
+
+class UnsupportedBackend(Exception):
+    """Raised when message search has no index for the database backend."""
+
+
+def install(engine: Engine) -> None:
+    """Create the search index for this database if it is missing.
+
+    On SQLite an index created over an existing messages table is filled
+    from it once.
+    """
+    backend = engine.dialect.name
+    with engine.begin() as conn:
+        if backend == "sqlite":
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+            )).first()
+            for statement in SQLITE_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+        elif backend == "postgresql":
+            for statement in POSTGRES_DDL:
+                conn.execute(text(statement))
+
+
+def uninstall(engine: Engine) -> None:
+    """Drop the search index, e.g. before a bulk load; install() recreates and refills it."""
+    backend = engine.dialect.name
+    with engine.begin() as conn:
+        if backend == "sqlite":
+            for name in ("messages_fts_insert", "messages_fts_delete", "messages_fts_update"):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text("DROP TABLE IF EXISTS messages_fts"))
+            conn.execute(text("DROP VIEW IF EXISTS messages_fts_source"))
+        elif backend == "postgresql":
+            conn.execute(text("DROP INDEX IF EXISTS ix_messages_content_tsv"))
+
+
+def terms(query: str) -> List[str]:
+    return TERM.findall(query.lower())
+
+
+def _participant_token(email: str) -> str:
+    # Same encoding as hex() in the SQLite view
+    return email.encode().hex().upper()
+
+
+async def search_messages(
+    db: AsyncSession,
+    user: str,
+    query: str,
+    position: Optional[Tuple[float, int]],
+    limit: int,
+) -> List[Row]:
+    """Best-matching messages sent or received by user, best first.
+
+    Every word must match; the last one also matches as a prefix. Each row
+    carries a ``score`` (lower is better) and a highlighted ``snippet``; pass
+    the last row's ``(score, id)`` as position to get the next page. Raises
+    UnsupportedBackend on databases other than SQLite and PostgreSQL.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    backend = db.get_bind().dialect.name
+    if backend == "sqlite":
+        phrase = " ".join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*'
+        statement = f"""
+            SELECT m.id, m.sender, m.recipient, m.content, m.timestamp, m.status, m.is_bot_response,
+                   snippet(messages_fts, 0, :start, :end, '…', {SNIPPET_WORDS}) AS snippet,
+                   bm25(messages_fts, 1.0, 0.0) AS score
+            FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+            WHERE messages_fts MATCH :match
+              AND (m.sender = :user OR m.recipient = :user)
+              {{keyset}}
+            ORDER BY score, m.id
+            LIMIT :limit
+        """
+        params = {"match": f'content: ({phrase.strip()}) AND participants: "{_participant_token(user)}"'}
+        score = "bm25(messages_fts, 1.0, 0.0)"
+    elif backend == "postgresql":
+        statement = f"""
+            SELECT m.id, m.sender, m.recipient, m.content, m.timestamp, m.status, m.is_bot_response,
+                   ts_headline('simple', m.content, q,
+                       'StartSel=' || :start || ', StopSel=' || :end || ', MaxWords={SNIPPET_WORDS}, MinWords=3') AS snippet,
+                   -ts_rank({TS_VECTOR}, q) AS score
+            FROM messages m, to_tsquery('simple', :match) q
+            WHERE {TS_VECTOR} @@ q
+              AND (m.sender = :user OR m.recipient = :user)
+              {{keyset}}
+            ORDER BY score, m.id
+            LIMIT :limit
+        """
+        params = {"match": " & ".join(words[:-1] + [f"{words[-1]}:*"])}
+        score = f"-ts_rank({TS_VECTOR}, q)"
+    else:
+        raise UnsupportedBackend(f"Message search is not supported on {backend}")
+
+    keyset = ""
+    if position is not None:
+        keyset = f"AND ({score} > :score OR ({score} = :score AND m.id > :after_id))"
+        params.update(score=position[0], after_id=position[1])
+    # Typed columns so timestamps and statuses come back as they do from the ORM
+    statement = text(statement.format(keyset=keyset)).columns(
+        Message.id, Message.sender, Message.recipient, Message.content, Message.timestamp,
+        Message.status, Message.is_bot_response, column("snippet", String), column("score", Float),
+    )
+    result = await db.execute(
+        statement,
+        {**params, "user": user, "start": SNIPPET_START, "end": SNIPPET_END, "limit": limit},
+    )
+    return list(result.all())
+
+
+if __name__ == "__main__":
+    from .database import engine
+    install(engine)
+    print("Search index ready")
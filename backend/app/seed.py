@@ -1,144 +1,249 @@
-from sqlalchemy.orm import Session
-from .database import SessionLocal, engine
-from .models import Base, User, Message, ActivityLog, MessageStatus
-from .security import get_password_hash
+"""Fill the database with the demo accounts plus a synthetic, production-shaped dataset.
+
+    python -m app.seed                                        # small demo dataset
+    python -m app.seed --users 100000 --messages 10000000 --days 730
+
+Everything is regenerated from scratch: existing rows are removed first.
+User popularity and conversation sizes follow Zipf distributions controlled
+by ``--skew``; messages are spread evenly over ``--days`` up to now, so ids
+grow with time like in production. All accounts share one password whose
+hash is computed once.
+"""
+import argparse
+import csv
+import enum
+import io
+import itertools
+import random
+import time
 from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Sequence, Tuple
+from sqlalchemy import Table, delete, text
+from sqlalchemy.engine import Connection
+from .config import settings
+from .database import SessionLocal, create_schema, engine
+from .models import (
+    User, Message, MessageSegment, ActivityLog, ActivityDaily, BotContext, MessageStatus, Conversation
+)
+from .security import get_password_hash
+from . import conversations, search
+
+DEMO_USERS = ["alice@example.com", "bob@example.com", "charlie@example.com"]
+PASSWORD = "Password@123"
+
+WORDS = """
+hey hi hello thanks sure okay yes no maybe later today tomorrow tonight weekend morning
+meeting lunch dinner coffee call send check file document photo link project deadline
+review update plan trip flight hotel train ticket party birthday gift movie game match
+team office home work school class exam homework book music song concert ticket price
+order delivery package address phone number email password account bank payment invoice
+doctor appointment gym run walk bike car traffic weather rain sun cold hot late early
+great awesome cool nice sorry please help question answer idea problem fix done ready
+what when where who why how can could would should will did does is are was were the a
+to for with about from on at in and or but so just really very too also still again
+""".split()
+
+
+def zipf_cumulative(n: int, skew: float) -> List[float]:
+    """Cumulative weights where rank r gets 1 / r**skew."""
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, n + 1)))
+
+
+def make_pairs(emails: Sequence[str], contacts: int, skew: float, rng: random.Random) -> List[Tuple[str, str]]:
+    """Give every user up to ``contacts`` conversation partners, favouring popular users."""
+    weights = zipf_cumulative(len(emails), skew)
+    pairs = set()
+    for email in emails:
+        for partner in rng.choices(emails, cum_weights=weights, k=contacts):
+            if partner != email:
+                pairs.add(conversations.pair_key(email, partner))
+    pairs = sorted(pairs)
+    rng.shuffle(pairs)
+    return pairs
+
+
+def bulk_insert(conn: Connection, table: Table, rows: List[dict]) -> None:
+    """Insert rows with one executemany, or COPY on PostgreSQL with psycopg2."""
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(row[column]) for column in columns])
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        conn.execute(table.insert(), rows)
+
+
+def _copy_value(value):
+    if isinstance(value, enum.Enum):
+        # SQLAlchemy stores enum names, not values
+        return value.name
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return value
+
 
-def seed_database():
-    """Seed the database with initial data."""
-    # Create tables
-    Base.metadata.create_all(bind=engine)
-    
+def generate_messages(
+    emails: Sequence[str],
+    pairs: Sequence[Tuple[str, str]],
+    total: int,
+    skew: float,
+    start: datetime,
+    span: timedelta,
+    bot_share: float,
+    unread: float,
+    batch_size: int,
+    rng: random.Random,
+) -> Iterator[List[dict]]:
+    """Yield message rows in time order, in batches of batch_size."""
+    pair_weights = zipf_cumulative(len(pairs), skew)
+    user_weights = zipf_cumulative(len(emails), skew)
+    step = span.total_seconds() / max(total, 1)
+    bot = settings.BOT_IDENTIFIER
+    for offset in range(0, total, batch_size):
+        count = min(batch_size, total - offset)
+        chosen = rng.choices(pairs, cum_weights=pair_weights, k=count) if pairs else []
+        rows = []
+        for index in range(count):
+            if not pairs or rng.random() < bot_share:
+                first, second = rng.choices(emails, cum_weights=user_weights)[0], bot
+            else:
+                first, second = chosen[index]
+            sender, recipient = (first, second) if rng.random() < 0.5 else (second, first)
+            draw = rng.random()
+            if draw >= unread:
+                status = MessageStatus.READ
+            else:
+                status = MessageStatus.DELIVERED if draw < unread / 2 else MessageStatus.SENT
+            rows.append({
+                "sender": sender,
+                "recipient": recipient,
+                "content": " ".join(rng.choices(WORDS, k=rng.randint(2, 16))).capitalize(),
+                "timestamp": start + timedelta(seconds=(offset + index) * step),
+                "status": status,
+                "is_bot_response": sender == bot,
+            })
+        yield rows
+
+
+def clear(conn: Connection) -> None:
+    tables = [ActivityLog, ActivityDaily, Conversation, MessageSegment, Message, BotContext, User]
+    if conn.dialect.name == "postgresql":
+        names = ", ".join(model.__tablename__ for model in tables)
+        conn.execute(text(f"TRUNCATE {names} RESTART IDENTITY"))
+    else:
+        for model in tables:
+            conn.execute(delete(model))
+
+
+def seed_database(
+    users: int = 50,
+    messages: int = 5000,
+    days: float = 90,
+    skew: float = 1.1,
+    contacts: int = 5,
+    bot_share: float = 0.05,
+    unread: float = 0.02,
+    activity_share: float = 0.1,
+    batch_size: int = 20000,
+    seed: int = 1,
+) -> None:
+    """Replace the database contents with a generated dataset."""
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    span = timedelta(days=days)
+    start = now - span
+
+    create_schema(engine)
+    # Triggers and secondary indexes are far cheaper to build once after the load
+    search.uninstall(engine)
+    message_indexes = list(Message.__table__.indexes)
+    with engine.begin() as conn:
+        clear(conn)
+        for index in message_indexes:
+            index.drop(conn, checkfirst=True)
+
+    emails = DEMO_USERS + [f"user{n:06d}@example.com" for n in range(max(users - len(DEMO_USERS), 0))]
+    emails = emails[:max(users, 1)]
+    hashed_password = get_password_hash(PASSWORD)
+    user_rows = [
+        {"email": email, "hashed_password": hashed_password, "created_at": start - timedelta(days=rng.random() * 30)}
+        for email in emails
+    ]
+    with engine.begin() as conn:
+        for chunk in range(0, len(user_rows), batch_size):
+            bulk_insert(conn, User.__table__, user_rows[chunk:chunk + batch_size])
+            bulk_insert(conn, ActivityLog.__table__, [
+                {"user_email": row["email"], "action": "user_registered",
+                 "details": f"{row['email']} registered", "timestamp": row["created_at"]}
+                for row in user_rows[chunk:chunk + batch_size]
+            ])
+    print(f"Inserted {len(emails)} users")
+
+    pairs = make_pairs(emails, contacts, skew, rng)
+    written = 0
+    for rows in generate_messages(emails, pairs, messages, skew, start, span, bot_share, unread, batch_size, rng):
+        activity = [
+            {"user_email": row["sender"], "action": "bot_response" if row["is_bot_response"] else "message_sent",
+             "details": f"{row['sender']} -> {row['recipient']}: {row['content'][:50]}", "timestamp": row["timestamp"]}
+            for row in rows if rng.random() < activity_share
+        ]
+        with engine.begin() as conn:
+            bulk_insert(conn, Message.__table__, rows)
+            bulk_insert(conn, ActivityLog.__table__, activity)
+        written += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"Inserted {written}/{messages} messages ({written / elapsed:,.0f}/s)", end="\r", flush=True)
+    print()
+
+    with engine.begin() as conn:
+        for index in message_indexes:
+            index.create(conn, checkfirst=True)
+    print("Rebuilt message indexes")
     db = SessionLocal()
     try:
-        # Clear existing data
-        db.query(ActivityLog).delete()
-        db.query(Message).delete()
-        db.query(User).delete()
-        
-        # Create demo users
-        users_data = [
-            {
-                "email": "alice@example.com",
-                "password": "Password@123"
-            },
-            {
-                "email": "bob@example.com", 
-                "password": "Password@123"
-            },
-            {
-                "email": "charlie@example.com",
-                "password": "Password@123"
-            }
-        ]
-        
-        users = []
-        for user_data in users_data:
-            try:
-                hashed_password = get_password_hash(user_data["password"])
-                user = User(
-                    email=user_data["email"],
-                    hashed_password=hashed_password
-                )
-                db.add(user)
-                users.append(user)
-            except Exception as e:
-                print(f"Warning: Could not create user {user_data['email']}: {e}")
-                continue
-        
-        db.commit()
-        
-        # Create sample messages
-        messages_data = [
-            {
-                "sender": "alice@example.com",
-                "recipient": "bob@example.com",
-                "content": "Hey Bob! How are you doing?",
-                "status": MessageStatus.READ,
-                "is_bot_response": False
-            },
-            {
-                "sender": "bob@example.com",
-                "recipient": "alice@example.com", 
-                "content": "Hi Alice! I'm doing great, thanks for asking!",
-                "status": MessageStatus.DELIVERED,
-                "is_bot_response": False
-            },
-            {
-                "sender": "alice@example.com",
-                "recipient": "whatsease_bot",
-                "content": "Hello bot!",
-                "status": MessageStatus.READ,
-                "is_bot_response": False
-            },
-            {
-                "sender": "whatsease_bot",
-                "recipient": "alice@example.com",
-                "content": "Hello! How can I help you today?",
-                "status": MessageStatus.READ,
-                "is_bot_response": True
-            }
-        ]
-        
-        for msg_data in messages_data:
-            message = Message(
-                sender=msg_data["sender"],
-                recipient=msg_data["recipient"],
-                content=msg_data["content"],
-                status=msg_data["status"],
-                is_bot_response=msg_data["is_bot_response"],
-                timestamp=datetime.now(timezone.utc) - timedelta(hours=1)
-            )
-            db.add(message)
-        
-        # Create activity logs
-        activities_data = [
-            {
-                "user_email": "alice@example.com",
-                "action": "user_registered",
-                "details": "Alice registered for the first time"
-            },
-            {
-                "user_email": "bob@example.com",
-                "action": "user_registered", 
-                "details": "Bob registered for the first time"
-            },
-            {
-                "user_email": "alice@example.com",
-                "action": "message_sent",
-                "details": "Alice sent a message to Bob"
-            },
-            {
-                "user_email": "bob@example.com",
-                "action": "message_sent",
-                "details": "Bob replied to Alice"
-            },
-            {
-                "user_email": "alice@example.com",
-                "action": "bot_interaction",
-                "details": "Alice started a conversation with WhatsEase bot"
-            }
-        ]
-        
-        for activity_data in activities_data:
-            activity = ActivityLog(
-                user_email=activity_data["user_email"],
-                action=activity_data["action"],
-                details=activity_data["details"],
-                timestamp=datetime.now(timezone.utc) - timedelta(hours=1)
-            )
-            db.add(activity)
-        
-        db.commit()
-        print("Database seeded successfully!")
-        
-    except Exception as e:
-        print(f"Error seeding database: {e}")
-        db.rollback()
+        print(f"Rebuilt {conversations.rebuild(db)} conversations")
     finally:
         db.close()
+    search.install(engine)
+    print("Rebuilt search index")
+    print(f"Database seeded in {time.perf_counter() - started:.1f}s; every account uses the password {PASSWORD}")
 
-if __name__ == "__main__":
-    seed_database()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="accounts, including the demo users")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--days", type=float, default=90, help="time span the messages cover, ending now")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for user and conversation popularity")
+    parser.add_argument("--contacts", type=int, default=5, help="conversation partners drawn per user")
+    parser.add_argument("--bot-share", type=float, default=0.05, help="fraction of messages with the bot")
+    parser.add_argument("--unread", type=float, default=0.02, help="fraction of messages not yet read")
+    parser.add_argument("--activity-share", type=float, default=0.1, help="fraction of messages with an activity row")
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1, help="random seed, for reproducible datasets")
+    args = parser.parse_args()
+    seed_database(
+        users=args.users,
+        messages=args.messages,
+        days=args.days,
+        skew=args.skew,
+        contacts=args.contacts,
+        bot_share=args.bot_share,
+        unread=args.unread,
+        activity_share=args.activity_share,
+        batch_size=args.batch_size,
+        seed=args.seed,
+    )
 
 
+if __name__ == "__main__":
+    main()
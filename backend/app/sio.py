@@ -1,25 +1,73 @@
 import socketio
-from sqlalchemy.orm import Session
-from .database import SessionLocal
+import time
+from collections import defaultdict
+from typing import Dict, List
+from sqlalchemy import select, update
+from .database import AsyncSessionLocal
 from .security import decode_access_token
-from .bot import bot
-from .models import Message, MessageStatus, ActivityLog
+from .bot_pool import bot_pool
+from .models import Message, MessageStatus
+from .pipeline import message_pipeline
+from .activity_sink import activity_sink
 from .config import settings
+from .broker import create_client_manager
+from .presence import presence
+from . import conversations
+from .wire import SocketJSON, message_to_wire
+from .transport import NegotiatingServer
+from .metrics import socketio_event_seconds, socketio_forced_disconnects, socketio_throttled
+from .ratelimit import ALLOW, DISCONNECT, event_limiter
+from . import query_budget
 
-sio = socketio.AsyncServer(
+sio = NegotiatingServer(
+    client_manager=create_client_manager(),
     cors_allowed_origins="*",
-    async_mode="asgi"
+    async_mode="asgi",
+    json=SocketJSON,
+    outbound_limit=settings.SOCKET_OUTBOUND_QUEUE,
+    slow_consumer_seconds=settings.SOCKET_SLOW_CONSUMER_SECONDS
 )
+presence.attach(sio.manager)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        return db
-    except Exception:
-        db.close()
-        raise
+def start_client_manager():
+    """Join the cross-worker manager at startup instead of on the first connection."""
+    if not sio.manager_initialized:
+        sio.manager_initialized = True
+        sio.manager.initialize()
+
+async def stop_client_manager():
+    if hasattr(sio.manager, "close"):
+        await sio.manager.close()
 
 class AuthServerNamespace(socketio.AsyncNamespace):
+    async def trigger_event(self, event, *args):
+        # Time every handler, connect and disconnect included
+        started = time.perf_counter()
+        label = event if hasattr(self, f"on_{event}") else "unknown"
+        if event not in ("connect", "disconnect") and event_limiter.enabled:
+            verdict = event_limiter.check(args[0], event)
+            if verdict != ALLOW:
+                return await self.throttle(args[0], event, label, verdict)
+        try:
+            with query_budget.scope(f"socket {label}"):
+                return await super().trigger_event(event, *args)
+        finally:
+            socketio_event_seconds.time((label,), started)
+
+    async def throttle(self, sid, event: str, label: str, verdict: str):
+        """Drop an event over the sender's rate limit; disconnect a session that stays over it.
+
+        A dropped event is acknowledged with when to retry, so clients that
+        asked for an ack can back off.
+        """
+        socketio_throttled.inc((label,))
+        if verdict == DISCONNECT:
+            # Counted, not logged: a client can trigger this at will
+            socketio_forced_disconnects.inc(("rate_limit",))
+            await self.disconnect(sid)
+            return None
+        return {"error": "rate_limited", "retry_after": event_limiter.retry_after(sid, event)}
+
     async def on_connect(self, sid, environ, auth=None):
         token = None
         # 1) Prefer Socket.IO auth payload
@@ -35,20 +83,80 @@ class AuthServerNamespace(socketio.AsyncNamespace):
         user_email = decode_access_token(token) if token else None
         if not user_email:
             return False  # reject
-        self.server.save_session(sid, {"user": user_email})
+        await self.save_session(sid, {"user": user_email})
+        event_limiter.connect(sid, user_email)
         await self.enter_room(sid, f"user:{user_email}")
+        await presence.connect(user_email, sid)
+        # Deliver what piled up while offline once the connection is accepted
+        self.server.start_background_task(self.flush_pending, sid, user_email)
         print(f"User {user_email} connected")
         return True
 
+    async def flush_pending(self, sid, user_email: str):
+        """Push messages still marked Sent to a reconnecting user in bounded chunks.
+
+        Each chunk costs one SELECT and one set-based UPDATE; senders get a
+        single status event listing all of their messages that were delivered.
+        """
+        delivered: Dict[str, List[int]] = defaultdict(list)
+        last_id = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(Message).where(
+                        Message.recipient == user_email,
+                        Message.status == MessageStatus.SENT,
+                        Message.id > last_id
+                    ).order_by(Message.id.asc()).limit(settings.PENDING_FLUSH_CHUNK)
+                )
+                pending = result.scalars().all()
+                if not pending:
+                    break
+                await db.execute(
+                    update(Message).where(
+                        Message.id.in_([m.id for m in pending]),
+                        Message.status == MessageStatus.SENT
+                    ).values(status=MessageStatus.DELIVERED)
+                )
+                await db.commit()
+
+            await self.emit("messages", [
+                message_to_wire(m, MessageStatus.DELIVERED) for m in pending
+            ], to=sid)
+            for m in pending:
+                delivered[m.sender].append(m.id)
+            last_id = pending[-1].id
+            if len(pending) < settings.PENDING_FLUSH_CHUNK:
+                break
+
+        for sender, message_ids in delivered.items():
+            await self.emit("status", {
+                "message_ids": message_ids,
+                "status": MessageStatus.DELIVERED.value
+            }, room=f"user:{sender}")
+
     async def on_disconnect(self, sid):
-        session = self.server.get_session(sid)
+        event_limiter.disconnect(sid)
+        session = await self.get_session(sid)
         if session and "user" in session:
             user_email = session["user"]
+            # Only this session leaves the room; other tabs keep the user online
             await self.leave_room(sid, f"user:{user_email}")
-            print(f"User {user_email} disconnected")
+            await presence.disconnect(user_email, sid)
+            print(f"User {user_email} disconnected ({presence.session_count(user_email)} sessions left)")
+
+    async def on_presence(self, sid, data):
+        """Batched presence lookup; the result is returned as the event ack."""
+        session = await self.get_session(sid)
+        if not session or "user" not in session:
+            return {}
+        users = data.get("users") if isinstance(data, dict) else None
+        if not isinstance(users, list):
+            return {}
+        return presence.query(users[:settings.PRESENCE_QUERY_MAX])
 
     async def on_send_message(self, sid, data):
-        session = self.server.get_session(sid)
+        session = await self.get_session(sid)
         if not session or "user" not in session:
             return
         
@@ -59,122 +167,59 @@ class AuthServerNamespace(socketio.AsyncNamespace):
         if not recipient or not content:
             return
         
-        # Save message to SQLite
-        db = get_db()
-        try:
-            message = Message(
-                sender=sender_email,
-                recipient=recipient,
-                content=content
-            )
-            
-            db.add(message)
-            db.commit()
-            db.refresh(message)
-            
-            # Log activity
-            activity = ActivityLog(
-                user_email=sender_email,
-                action="message_sent",
-                details=f"{sender_email} -> {recipient}: {content[:50]}"
-            )
-            db.add(activity)
-            db.commit()
-            
-            # Echo message back to sender
-            await self.emit("message", {
-                "id": message.id,
-                "sender": message.sender,
-                "recipient": message.recipient,
-                "content": message.content,
-                "timestamp": message.timestamp.isoformat(),
-                "status": message.status.value,
-                "is_bot_response": message.is_bot_response
-            }, room=f"user:{sender_email}")
-            
-            # Check if recipient is online
-            recipient_room = f"user:{recipient}"
-            if recipient_room in self.server.rooms:
-                # Recipient is online, send message and mark as delivered
-                await self.emit("message", {
-                    "id": message.id,
-                    "sender": message.sender,
-                    "recipient": message.recipient,
-                    "content": message.content,
-                    "timestamp": message.timestamp.isoformat(),
-                    "status": "Delivered",
-                    "is_bot_response": message.is_bot_response
-                }, room=recipient_room)
-                
-                # Update status to delivered
-                message.status = MessageStatus.DELIVERED
-                db.commit()
-
-            # Emit updated unread count to recipient
-            try:
-                unread_count = db.query(Message).filter(
-                    Message.sender == sender_email,
-                    Message.recipient == recipient,
-                    Message.status != MessageStatus.READ
-                ).count()
-                await self.emit("unread", {
-                    "peer": sender_email,
-                    "unread": unread_count,
-                }, room=recipient_room)
-            except Exception:
-                pass
-            
-            # Check if recipient is bot
-            if recipient == settings.BOT_IDENTIFIER:
-                await self.handle_bot_response(sender_email, content, message.id)
-                
-        finally:
-            db.close()
+        # Delivery status is known up front, so the message, its status and
+        # conversation summary are written in one group-committed batch
+        recipient_room = f"user:{recipient}"
+        online = presence.is_online(recipient)
+        message = await message_pipeline.submit(
+            sender_email,
+            recipient,
+            content,
+            status=MessageStatus.DELIVERED if online else MessageStatus.SENT
+        )
+        await activity_sink.record(
+            sender_email, "message_sent", f"{sender_email} -> {recipient}: {content[:50]}"
+        )
+        
+        # Echo message back to sender and deliver it; one emit encodes the
+        # packet once for both. The recipient room is always included, so a
+        # session presence has not heard about yet still gets it live; the
+        # message then stays Sent until the flush on the recipient's next connect
+        await self.emit("message", message_to_wire(message), room=[f"user:{sender_email}", recipient_room])
+
+        # Emit updated unread count to recipient
+        await self.emit("unread", {
+            "peer": sender_email,
+            "unread": message.recipient_unread,
+        }, room=recipient_room)
+        
+        # Check if recipient is bot
+        if recipient == settings.BOT_IDENTIFIER:
+            await self.handle_bot_response(sender_email, content, message.id)
 
     async def handle_bot_response(self, user_email: str, user_message: str, message_id: int):
         """Handle bot responses to user messages."""
-        bot_response = bot.get_response(user_message)
+        user_room = f"user:{user_email}"
+        await self.emit("typing", {"peer": settings.BOT_IDENTIFIER, "typing": True}, room=user_room)
+        bot_response = await bot_pool.reply(user_email, user_message)
         
-        db = get_db()
-        try:
-            # Create bot response message
-            bot_message = Message(
-                sender=settings.BOT_IDENTIFIER,
-                recipient=user_email,
-                content=bot_response,
-                is_bot_response=True
-            )
-            
-            db.add(bot_message)
-            db.commit()
-            db.refresh(bot_message)
-            
-            # Log bot activity
-            activity = ActivityLog(
-                user_email=settings.BOT_IDENTIFIER,
-                action="bot_response",
-                details=f"Bot responded to {user_email}: {bot_response[:50]}"
-            )
-            db.add(activity)
-            db.commit()
-            
-            # Send bot response to user
-            await self.emit("message", {
-                "id": bot_message.id,
-                "sender": bot_message.sender,
-                "recipient": bot_message.recipient,
-                "content": bot_message.content,
-                "timestamp": bot_message.timestamp.isoformat(),
-                "status": bot_message.status.value,
-                "is_bot_response": bot_message.is_bot_response
-            }, room=f"user:{user_email}")
-            
-        finally:
-            db.close()
+        bot_message = await message_pipeline.submit(
+            settings.BOT_IDENTIFIER,
+            user_email,
+            bot_response,
+            is_bot_response=True
+        )
+        await activity_sink.record(
+            settings.BOT_IDENTIFIER, "bot_response", f"Bot responded to {user_email}: {bot_response[:50]}"
+        )
+        
+        # Send bot response to user
+        await self.emit("message", message_to_wire(bot_message), room=user_room)
+        await self.emit("typing", {"peer": settings.BOT_IDENTIFIER, "typing": False}, room=user_room)
 
     async def on_mark_read(self, sid, data):
         """Mark messages as read."""
-        session = self.server.get_session(sid)
+        session = await self.get_session(sid)
         if not session or "user" not in session:
             return
         
@@ -184,37 +229,88 @@ class AuthServerNamespace(socketio.AsyncNamespace):
         if not message_id:
             return
         
-        db = get_db()
-        try:
-            # Find and update message status
-            message = db.query(Message).filter(
-                Message.id == message_id,
-                Message.recipient == user_email
-            ).first()
-            
-            if message:
-                message.status = MessageStatus.READ
-                db.commit()
-                
-                # Notify sender that message was read
-                await self.emit("status", {
-                    "message_id": message_id,
-                    "status": "Read"
-                }, room=f"user:{message.sender}")
-
-                # Notify recipient (the reader) with updated unread count for this peer
-                unread_remaining = db.query(Message).filter(
-                    Message.sender == message.sender,
+        async with AsyncSessionLocal() as db:
+            # Only the call that flips the status decrements the counter, so a
+            # second tab or a retried event cannot count the same message twice
+            sender = await db.scalar(
+                update(Message).where(
+                    Message.id == message_id,
                     Message.recipient == user_email,
                     Message.status != MessageStatus.READ
-                ).count()
-                await self.emit("unread", {
-                    "peer": message.sender,
-                    "unread": unread_remaining,
-                }, room=f"user:{user_email}")
-                
-        finally:
-            db.close()
+                ).values(status=MessageStatus.READ).returning(
+                    Message.sender
+                ).execution_options(synchronize_session=False)
+            )
+            if sender is not None:
+                unread_remaining = await conversations.mark_read(db, user_email, sender)
+            else:
+                # Already read (or not this reader's message): report the count as it is
+                sender = await db.scalar(
+                    select(Message.sender).where(
+                        Message.id == message_id,
+                        Message.recipient == user_email
+                    )
+                )
+                if sender is None:
+                    return
+                unread_remaining = await conversations.unread_count(db, user_email, sender)
+            await db.commit()
+
+        # Notify sender that message was read
+        await self.emit("status", {
+            "message_id": message_id,
+            "status": "Read"
+        }, room=f"user:{sender}")
+
+        # Notify recipient (the reader) with updated unread count for this peer
+        await self.emit("unread", {
+            "peer": sender,
+            "unread": unread_remaining,
+        }, room=f"user:{user_email}")
+
+    async def on_mark_read_up_to(self, sid, data):
+        """Mark everything from a peer up to a message id as read.
+
+        One UPDATE covers the whole range; the peer gets a single status event
+        and the reader a single unread update.
+        """
+        session = await self.get_session(sid)
+        if not session or "user" not in session:
+            return
+        
+        user_email = session["user"]
+        peer = data.get("peer")
+        up_to = data.get("up_to")
+        
+        if not peer or not isinstance(up_to, int):
+            return
+        
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(Message).where(
+                    Message.sender == peer,
+                    Message.recipient == user_email,
+                    Message.id <= up_to,
+                    Message.status != MessageStatus.READ
+                ).values(status=MessageStatus.READ).returning(
+                    Message.id
+                ).execution_options(synchronize_session=False)
+            )
+            read_ids = sorted(result.scalars().all())
+            unread_remaining = await conversations.mark_read(db, user_email, peer, len(read_ids))
+            await db.commit()
+
+        if read_ids:
+            await self.emit("status", {
+                "message_ids": read_ids,
+                "up_to": up_to,
+                "status": "Read"
+            }, room=f"user:{peer}")
+
+        await self.emit("unread", {
+            "peer": peer,
+            "unread": unread_remaining,
+        }, room=f"user:{user_email}")
 
 # Register namespace
 sio.register_namespace(AuthServerNamespace("/"))
@@ -0,0 +1,229 @@
+import asyncio
+import itertools
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Union
+from urllib.parse import parse_qs
+import socketio
+from engineio import packet as eio_packet
+from socketio import packet
+from .metrics import socketio_forced_disconnects, socketio_outbound
+from .wire import compact_event
+
+try:
+    from socketio.msgpack_packet import MsgPackPacket
+except ImportError:  # msgpack not installed; every client gets JSON
+    MsgPackPacket = None
+
+
+def encode_msgpack(pkt: packet.Packet) -> bytes:
+    """Encode a Socket.IO packet as MessagePack, events in the compact schema."""
+    data = pkt.data
+    if pkt.packet_type == packet.EVENT:
+        data = compact_event(data)
+    return MsgPackPacket(pkt.packet_type, data=data, namespace=pkt.namespace, id=pkt.id).encode()
+
+
+def coalesce_key(event: str, payload) -> Optional[tuple]:
+    """Events where a newer one makes an older one pending for the same client redundant."""
+    if not isinstance(payload, dict):
+        return None
+    if event in ("unread", "typing"):
+        return (event, payload.get("peer"))
+    if event == "status":
+        return (event, payload.get("status"))
+    return None
+
+
+def coalesce(event: str, held: dict, payload: dict) -> dict:
+    if event == "status":
+        # Status updates merge into one event listing every message id
+        ids = held["message_ids"] + (payload["message_ids"] if "message_ids" in payload else [payload["message_id"]])
+        return {"message_ids": ids, "status": payload["status"]}
+    return payload
+
+
+class Backlog:
+    """Events held back for a slow session until its transport queue drains.
+
+    Bounded by the server's outbound limit; ``unread``, ``typing`` and
+    ``status`` events are coalesced instead of queued behind each other.
+    """
+
+    def __init__(self):
+        self.packets: "OrderedDict[object, Union[packet.Packet, eio_packet.Packet]]" = OrderedDict()
+        self.since = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+
+
+class NegotiatingServer(socketio.AsyncServer):
+    """Socket.IO server that speaks MessagePack to clients that ask for it.
+
+    A client opts in by adding ``serializer=msgpack`` to the connection query
+    string, which is seen before its first packet. Its packets are decoded
+    and encoded with MessagePack and its events use the compact schema from
+    ``wire``; all other clients keep the default JSON packets. Broadcasts are
+    still encoded once as JSON by the manager and re-encoded at most once
+    more for the MessagePack clients among the recipients.
+
+    Each session's outbound queue is bounded by ``outbound_limit`` packets.
+    Once a client stops keeping up, further events wait in a ``Backlog``
+    where status and unread updates are coalesced; a client that is still
+    behind after ``slow_consumer_seconds``, or whose backlog overflows, is
+    disconnected and catches up from the REST API when it reconnects.
+    """
+
+    DRAIN_INTERVAL = 0.05
+
+    def __init__(self, *args, outbound_limit: int = 0, slow_consumer_seconds: float = 10.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._msgpack: Set[str] = set()  # engine.io sids using MessagePack
+        self._recoded: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.outbound_limit = outbound_limit
+        self.slow_consumer_seconds = slow_consumer_seconds
+        self._backlogs: Dict[str, Backlog] = {}
+        self._sequence = itertools.count()
+
+    def uses_msgpack(self, eio_sid: str) -> bool:
+        return eio_sid in self._msgpack
+
+    async def _handle_eio_connect(self, eio_sid, environ):
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        if MsgPackPacket is not None and query.get("serializer") == ["msgpack"]:
+            self._msgpack.add(eio_sid)
+        return await super()._handle_eio_connect(eio_sid, environ)
+
+    async def _handle_eio_disconnect(self, eio_sid, reason):
+        try:
+            return await super()._handle_eio_disconnect(eio_sid, reason)
+        finally:
+            self._msgpack.discard(eio_sid)
+            backlog = self._backlogs.pop(eio_sid, None)
+            if backlog is not None and backlog.task is not None:
+                backlog.task.cancel()
+
+    async def _handle_eio_message(self, eio_sid, data):
+        if eio_sid not in self._msgpack:
+            return await super()._handle_eio_message(eio_sid, data)
+        pkt = MsgPackPacket(encoded_packet=data)
+        if pkt.packet_type == packet.CONNECT:
+            await self._handle_connect(eio_sid, pkt.namespace, pkt.data)
+        elif pkt.packet_type == packet.DISCONNECT:
+            await self._handle_disconnect(eio_sid, pkt.namespace, self.reason.CLIENT_DISCONNECT)
+        elif pkt.packet_type == packet.EVENT:
+            await self._handle_event(eio_sid, pkt.namespace, pkt.id, pkt.data)
+        elif pkt.packet_type == packet.ACK:
+            await self._handle_ack(eio_sid, pkt.namespace, pkt.id, pkt.data)
+        else:
+            raise ValueError("Unexpected packet type.")
+
+    async def _send_packet(self, eio_sid, pkt):
+        if pkt.packet_type == packet.EVENT and self._is_slow(eio_sid):
+            return self._hold(eio_sid, pkt, pkt.data)
+        await self._write_packet(eio_sid, pkt)
+
+    async def _write_packet(self, eio_sid, pkt):
+        if eio_sid not in self._msgpack:
+            return await super()._send_packet(eio_sid, pkt)
+        await self.eio.send(eio_sid, encode_msgpack(pkt))
+
+    async def _send_eio_packet(self, eio_sid, eio_pkt):
+        # Only broadcast events arrive here
+        if self._is_slow(eio_sid):
+            data = None if eio_pkt.binary else self.packet_class(encoded_packet=eio_pkt.data).data
+            return self._hold(eio_sid, eio_pkt, data)
+        await self._write_eio_packet(eio_sid, eio_pkt)
+
+    async def _write_eio_packet(self, eio_sid, eio_pkt):
+        # Broadcasts arrive here already JSON-encoded, one packet object for
+        # all recipients, so its MessagePack form is cached on that object
+        if eio_sid in self._msgpack and not eio_pkt.binary:
+            recoded = self._recoded.get(eio_pkt)
+            if recoded is None:
+                pkt = self.packet_class(encoded_packet=eio_pkt.data)
+                recoded = eio_packet.Packet(eio_packet.MESSAGE, encode_msgpack(pkt))
+                self._recoded[eio_pkt] = recoded
+            eio_pkt = recoded
+        await super()._send_eio_packet(eio_sid, eio_pkt)
+
+    def _is_slow(self, eio_sid: str) -> bool:
+        if eio_sid in self._backlogs:
+            return True
+        if self.outbound_limit <= 0:
+            return False
+        socket = self.eio.sockets.get(eio_sid)
+        return socket is not None and socket.queue.qsize() >= self.outbound_limit
+
+    def _hold(self, eio_sid: str, pkt, data: Optional[list]) -> None:
+        backlog = self._backlogs.get(eio_sid)
+        if backlog is None:
+            backlog = self._backlogs[eio_sid] = Backlog()
+            backlog.task = asyncio.create_task(self._drain(eio_sid, backlog))
+        event, payload = (data[0], data[1]) if data and len(data) == 2 else (None, None)
+        key = coalesce_key(event, payload)
+        held = backlog.packets.get(key) if key is not None else None
+        if held is not None:
+            held.data = [event, coalesce(event, held.data[1], payload)]
+            backlog.packets.move_to_end(key)
+            socketio_outbound.inc(("coalesced",))
+            return
+        if len(backlog.packets) >= self.outbound_limit:
+            socketio_outbound.inc(("dropped",))
+            self._abandon(eio_sid, backlog)
+            return
+        if key is not None:
+            # Kept decoded so later updates can be merged in
+            pkt = self.packet_class(packet.EVENT, namespace=getattr(pkt, "namespace", None) or "/",
+                                    data=[event, coalesce(event, {"message_ids": []}, payload)])
+        backlog.packets[key if key is not None else next(self._sequence)] = pkt
+        socketio_outbound.inc(("held",))
+
+    async def _drain(self, eio_sid: str, backlog: Backlog) -> None:
+        """Release a backlog once the session's queue is half empty, or disconnect it."""
+        while self._backlogs.get(eio_sid) is backlog:
+            await asyncio.sleep(self.DRAIN_INTERVAL)
+            socket = self.eio.sockets.get(eio_sid)
+            if socket is None or socket.closed:
+                self._backlogs.pop(eio_sid, None)
+                return
+            if socket.queue.qsize() <= self.outbound_limit // 2:
+                # Events sent meanwhile still join the backlog, so order holds
+                while backlog.packets:
+                    _, pkt = backlog.packets.popitem(last=False)
+                    if isinstance(pkt, eio_packet.Packet):
+                        await self._write_eio_packet(eio_sid, pkt)
+                    else:
+                        await self._write_packet(eio_sid, pkt)
+                self._backlogs.pop(eio_sid, None)
+                return
+            if time.monotonic() - backlog.since > self.slow_consumer_seconds:
+                self._abandon(eio_sid, backlog)
+                return
+
+    def _abandon(self, eio_sid: str, backlog: Backlog) -> None:
+        """Disconnect a session that cannot keep up, discarding what it has not received."""
+        if self._backlogs.get(eio_sid) is not backlog:
+            return
+        del self._backlogs[eio_sid]
+        socketio_outbound.inc(("dropped",), len(backlog.packets))
+        socketio_forced_disconnects.inc(("slow_consumer",))
+        self.start_background_task(self._close_slow, eio_sid)
+
+    async def _close_slow(self, eio_sid: str) -> None:
+        socket = self.eio.sockets.get(eio_sid)
+        if socket is None:
+            return
+        # A graceful close would wait for the queue this client is not reading
+        while not socket.queue.empty():
+            socket.queue.get_nowait()
+            socket.queue.task_done()
+        await socket.close(wait=False, abort=True, reason=self.eio.reason.SERVER_DISCONNECT)
+        socket.queue.put_nowait(None)  # stops the websocket writer
+        self.eio.sockets.pop(eio_sid, None)
+
+    def outbound_stats(self) -> Dict[str, int]:
+        return {
+            "slow_sessions": len(self._backlogs),
+            "held_events": sum(len(backlog.packets) for backlog in self._backlogs.values()),
+        }
@@ -0,0 +1,115 @@
+import json
+from datetime import datetime, timezone
+from typing import Any, Optional
+from fastapi import Response
+from .models import MessageStatus
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library
+    orjson = None
+
+
+def message_to_wire(message: Any, status: Optional[MessageStatus] = None) -> dict:
+    """Wire form of a message, shared by the REST routers and Socket.IO.
+
+    Accepts anything with message attributes (ORM rows, pipeline results,
+    result rows) and builds the dict directly: these come from our own
+    database, so they skip pydantic validation. The timestamp and status
+    stay as objects; ``dumps`` writes them as ISO 8601 and the status value.
+    """
+    return {
+        "id": message.id,
+        "sender": message.sender,
+        "recipient": message.recipient,
+        "content": message.content,
+        "timestamp": message.timestamp,
+        "status": status or message.status,
+        "is_bot_response": bool(message.is_bot_response),
+    }
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode payload as JSON bytes, handling datetimes and enums."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class SocketJSON:
+    """``json``-module stand-in that lets python-socketio use the fast encoder."""
+
+    @staticmethod
+    def dumps(payload: Any, **kwargs) -> str:
+        return dumps(payload).decode()
+
+    @staticmethod
+    def loads(data: Any, **kwargs) -> Any:
+        return loads(data)
+
+
+def json_response(payload: Any) -> Response:
+    """Pre-encoded JSON response; FastAPI returns it without re-validating."""
+    return Response(content=dumps(payload), media_type="application/json")
+
+
+# Compact event schema for MessagePack clients: short keys, epoch-ms
+# timestamps and numeric statuses
+STATUS_CODES = {MessageStatus.SENT.value: 0, MessageStatus.DELIVERED.value: 1, MessageStatus.READ.value: 2}
+
+
+def epoch_ms(value: Any) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def compact_message(message: dict) -> dict:
+    return {
+        "i": message["id"],
+        "s": message["sender"],
+        "r": message["recipient"],
+        "c": message["content"],
+        "t": epoch_ms(message["timestamp"]),
+        "st": STATUS_CODES[message["status"]],
+        "b": message["is_bot_response"],
+    }
+
+
+def compact_status(update: dict) -> dict:
+    ids = update["message_ids"] if "message_ids" in update else [update["message_id"]]
+    compact = {"i": ids, "st": STATUS_CODES[update["status"]]}
+    if "up_to" in update:
+        compact["u"] = update["up_to"]
+    return compact
+
+
+COMPACT_EVENTS = {
+    "message": compact_message,
+    "messages": lambda messages: [compact_message(m) for m in messages],
+    "status": compact_status,
+    "unread": lambda update: {"p": update["peer"], "n": update["unread"]},
+    "typing": lambda update: {"p": update["peer"], "y": update["typing"]},
+}
+
+
+def compact_event(data: list) -> list:
+    """Rewrite ``[event, payload]`` packet data in the compact schema."""
+    compact = COMPACT_EVENTS.get(data[0]) if data else None
+    if compact is None or len(data) != 2:
+        return data
+    return [data[0], compact(data[1])]
@@ -0,0 +1,118 @@
+"""Hot table size and history paging before and after archival.
+
+Builds a conversation history spread over several months, pages through one
+conversation end to end, archives everything past the hot window, and pages
+through it again. Both walks must return the same messages.
+
+Run from ``backend/``::
+
+    python -m benchmarks.archive_paging --pairs 50 --messages 400 --months 24
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+import httpx  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app.archive import run_archival  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import AsyncSessionLocal, engine  # noqa: E402
+from app.deps import get_current_user  # noqa: E402
+from app.main import app, sio_app  # noqa: E402
+from app.models import Message, MessageSegment, MessageStatus  # noqa: E402
+
+
+def populate(pairs: int, per_pair: int, months: int) -> None:
+    now = datetime.now(timezone.utc)
+    span = timedelta(days=30 * months)
+    rows = []
+    for pair in range(pairs):
+        me, peer = f"user{pair}@example.com", f"peer{pair}@example.com"
+        for n in range(per_pair):
+            at = now - span + span * n / per_pair
+            rows.append({
+                "sender": me if n % 2 else peer,
+                "recipient": peer if n % 2 else me,
+                "content": f"message {n} about the weekend plans and the shared document",
+                "timestamp": at,
+                # A few recent messages are still unread
+                "status": MessageStatus.SENT if n >= per_pair - 3 else MessageStatus.READ,
+            })
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert(), rows)
+
+
+async def walk(client: httpx.AsyncClient, peer: str, limit: int):
+    """Page from the latest message back to the first; returns ids and per-page latencies."""
+    ids, latencies, cursor = [], [], None
+    while True:
+        params = {"peer": peer, "limit": limit}
+        if cursor:
+            params["before"] = cursor
+        started = time.perf_counter()
+        response = await client.get("/messages", params=params)
+        latencies.append(time.perf_counter() - started)
+        page = response.json()
+        ids = [m["id"] for m in page["messages"]] + ids
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids, latencies
+
+
+async def hot_rows() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Message))
+
+
+def ms(values) -> float:
+    return round(sum(values) / len(values) * 1000, 2)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pairs", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    populate(args.pairs, args.messages, args.months)
+    app.dependency_overrides[get_current_user] = lambda: "user0@example.com"
+    transport = httpx.ASGITransport(app=sio_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        rows_before = await hot_rows()
+        ids_before, before = await walk(client, "peer0@example.com", args.limit)
+        moved = await run_archival()
+        ids_after, after = await walk(client, "peer0@example.com", args.limit)
+        # The newest page is still served from the hot table alone
+        hot_page = before[0], after[0]
+
+    async with AsyncSessionLocal() as db:
+        segments, stored = (await db.execute(
+            select(func.count(), func.sum(func.length(MessageSegment.data)))
+        )).one()
+    assert ids_before == ids_after, "archived history does not match"
+    print(json.dumps({
+        "archive_after_days": settings.ARCHIVE_AFTER_DAYS,
+        "hot_rows_before": rows_before,
+        "hot_rows_after": await hot_rows(),
+        "archived": moved,
+        "segments": segments,
+        "segment_bytes": stored,
+        "pages": len(after),
+        "latest_page_ms": {"before": round(hot_page[0] * 1000, 2), "after": round(hot_page[1] * 1000, 2)},
+        "mean_page_ms": {"before": ms(before), "after": ms(after)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Compare event-loop stalls for concurrent message writes, sync vs async sessions.
+
+Run from ``backend/``::
+
+    python -m benchmarks.concurrent_sends --senders 50 --messages 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+from app.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from app.models import ActivityLog, Message  # noqa: E402
+
+
+def _rows(sender: str, n: int):
+    message = Message(sender=sender, recipient="peer@example.com", content=f"bench {n}")
+    activity = ActivityLog(user_email=sender, action="message_sent", details=f"bench {n}")
+    return message, activity
+
+
+async def sync_send(sender: str, n: int) -> None:
+    db = SessionLocal()
+    try:
+        db.add_all(_rows(sender, n))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def async_send(sender: str, n: int) -> None:
+    async with AsyncSessionLocal() as db:
+        db.add_all(_rows(sender, n))
+        await db.commit()
+
+
+async def _ticker(stop: asyncio.Event, lags: list, interval: float = 0.005) -> None:
+    """Record how late the loop wakes us up; large lags mean blocked I/O."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(send, senders: int, messages: int) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(stop, lags))
+
+    async def sender_loop(index: int) -> None:
+        for n in range(messages):
+            await send(f"user{index}@example.com", n)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender_loop(i) for i in range(senders)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    lags.sort()
+    total = senders * messages
+    return {
+        "messages": total,
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(total / elapsed, 1),
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1] * 1000, 2) if lags else None,
+        "loop_lag_max_ms": round(lags[-1] * 1000, 2) if lags else None,
+        "ticks": len(lags),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    results = {
+        "sync_session": await run(sync_send, args.senders, args.messages),
+        "async_session": await run(async_send, args.senders, args.messages),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
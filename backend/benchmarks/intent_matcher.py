@@ -0,0 +1,72 @@
+"""Compare the keyword-loop bot classifier with the compiled intent matcher.
+
+Run from ``backend/``::
+
+    python -m benchmarks.intent_matcher --intents 10 100 1000
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+from app.bot import IntentMatcher, bot
+
+
+def loop_match(intents: Dict[str, List[str]], message: str) -> Optional[str]:
+    """The original classifier: scan every keyword of every intent."""
+    message_lower = message.lower().strip()
+    for intent, keywords in intents.items():
+        if message_lower in keywords:
+            return intent
+    for intent, keywords in intents.items():
+        for keyword in keywords:
+            if keyword in message_lower:
+                return intent
+    return None
+
+
+def synthetic_intents(count: int, rng: random.Random) -> Dict[str, List[str]]:
+    intents = dict(bot.intents)
+    for n in range(count - len(intents)):
+        intents[f"intent_{n}"] = [f"topic{n} {word}" for word in ("info", "status", "price", "help", "hours")]
+    return intents
+
+
+def time_per_message(match, messages: List[str], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            match(message)
+    return (time.perf_counter() - started) / (rounds * len(messages)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--intents", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = [k for keywords in bot.intents.values() for k in keywords] + [
+        "could you", "tell me", "about", "the", "weather", "tomorrow", "please", "order",
+    ]
+    messages = [" ".join(rng.choices(vocabulary, k=rng.randint(1, 8))) for _ in range(args.messages)]
+
+    results = []
+    for count in args.intents:
+        intents = synthetic_intents(count, rng)
+        matcher = IntentMatcher(intents)
+        assert all(matcher.match(m) == loop_match(intents, m) for m in messages)
+        results.append({
+            "intents": len(intents),
+            "keywords": sum(len(k) for k in intents.values()),
+            "loop_us_per_message": round(time_per_message(lambda m: loop_match(intents, m), messages, args.rounds), 2),
+            "compiled_us_per_message": round(time_per_message(matcher.match, messages, args.rounds), 2),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
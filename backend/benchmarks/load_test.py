@@ -0,0 +1,320 @@
+"""Load test for the REST API and Socket.IO together.
+
+Each virtual user logs in through ``/auth/login``, holds a socket, and then
+until the run ends picks between sending a message to another virtual user,
+marking a received message as read, and polling ``/users`` and
+``/messages``. Socket operations are timed from the emit until the event the
+server sends back: the sender's own ``message`` echo for ``send_message`` and
+the peer's ``status`` event for ``mark_read``.
+
+By default the app runs in this process on a throwaway SQLite database behind
+uvicorn; ``--url`` points the harness at a server that is already running.
+Results are printed as JSON. With ``--thresholds`` any limit that is missed is
+listed under ``violations`` and the exit status is 1, so CI can gate on it.
+
+Run from ``backend/``::
+
+    python -m benchmarks.load_test --users 50 --duration 20 \\
+        --thresholds benchmarks/load_thresholds.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+import socketio
+
+PASSWORD = "LoadTest-Passw0rd"
+# Relative weight of each operation in a virtual user's loop
+MIX = {"send_message": 4, "mark_read": 3, "poll_users": 1, "poll_messages": 2}
+
+
+class Recorder:
+    """Collects latencies and errors per operation."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def ok(self, op: str, started: float) -> None:
+        self.latencies[op].append(time.perf_counter() - started)
+
+    def error(self, op: str) -> None:
+        self.errors[op] += 1
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        report = {}
+        for op in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies[op])
+            count, errors = len(values), self.errors[op]
+            report[op] = {
+                "count": count,
+                "errors": errors,
+                "error_rate": round(errors / (count + errors), 4) if count + errors else 0.0,
+                "rps": round(count / elapsed, 1),
+                "p50_ms": percentile(values, 0.50),
+                "p95_ms": percentile(values, 0.95),
+                "p99_ms": percentile(values, 0.99),
+                "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+            }
+        return report
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return round(values[min(int(len(values) * p), len(values) - 1)] * 1000, 2)
+
+
+class VirtualUser:
+    def __init__(self, harness: "Harness", email: str):
+        self.harness = harness
+        self.email = email
+        self.token: Optional[str] = None
+        self.socket = socketio.AsyncClient(reconnection=False)
+        self.inbox: List[dict] = []  # received messages not yet marked read
+        self.sent = 0
+        self.socket.on("message", self._on_message)
+        self.socket.on("status", self._on_status)
+
+    async def _on_message(self, data: dict) -> None:
+        if data.get("sender") == self.email:
+            waiter = self.harness.pending.pop(data.get("content"), None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+        elif data.get("recipient") == self.email:
+            self.inbox.append(data)
+
+    async def _on_status(self, data: dict) -> None:
+        if data.get("status") == "Read" and "message_id" in data:
+            waiter = self.harness.pending.pop(data["message_id"], None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def login(self) -> None:
+        harness = self.harness
+        started = time.perf_counter()
+        response = await harness.http.post("/auth/login", json={"email": self.email, "password": PASSWORD})
+        if response.status_code != 200:
+            harness.setup.error("login")
+            raise RuntimeError(f"login failed for {self.email}: {response.status_code}")
+        harness.setup.ok("login", started)
+        self.token = response.json()["access_token"]
+
+        started = time.perf_counter()
+        await self.socket.connect(harness.url, auth={"token": self.token}, transports=["websocket"])
+        harness.setup.ok("connect", started)
+
+    async def _await_event(self, op: str, key, emit) -> None:
+        harness = self.harness
+        waiter = asyncio.get_running_loop().create_future()
+        harness.pending[key] = waiter
+        started = time.perf_counter()
+        try:
+            await emit()
+            await asyncio.wait_for(waiter, harness.timeout)
+            harness.recorder.ok(op, started)
+        except (asyncio.TimeoutError, socketio.exceptions.SocketIOError):
+            harness.pending.pop(key, None)
+            harness.recorder.error(op)
+
+    async def send_message(self) -> None:
+        peer = self.harness.peer_of(self.email)
+        self.sent += 1
+        content = f"load {self.email} {self.sent}"
+        await self._await_event("send_message", content, lambda: self.socket.emit(
+            "send_message", {"recipient": peer, "content": content}
+        ))
+
+    async def mark_read(self) -> None:
+        if not self.inbox:
+            return await self.send_message()
+        message = self.inbox.pop(random.randrange(len(self.inbox)))
+        await self._await_event("mark_read", message["id"], lambda: self.socket.emit(
+            "mark_read", {"message_id": message["id"]}
+        ))
+
+    async def _get(self, op: str, path: str, params: Optional[dict] = None) -> None:
+        harness = self.harness
+        started = time.perf_counter()
+        try:
+            response = await harness.http.get(path, params=params, headers=self.headers)
+        except httpx.HTTPError:
+            harness.recorder.error(op)
+            return
+        if response.status_code == 200:
+            harness.recorder.ok(op, started)
+        else:
+            harness.recorder.error(op)
+
+    async def poll_users(self) -> None:
+        await self._get("poll_users", "/users")
+
+    async def poll_messages(self) -> None:
+        await self._get("poll_messages", "/messages", {"peer": self.harness.peer_of(self.email)})
+
+    async def run(self, deadline: float) -> None:
+        operations = [getattr(self, op) for op in MIX]
+        weights = list(MIX.values())
+        think = self.harness.think
+        while time.perf_counter() < deadline:
+            await random.choices(operations, weights)[0]()
+            if think:
+                await asyncio.sleep(random.expovariate(1 / think))
+
+    async def close(self) -> None:
+        if self.socket.connected:
+            await self.socket.disconnect()
+
+
+class Harness:
+    def __init__(self, url: str, users: int, think: float, timeout: float, prefix: str):
+        self.url = url
+        self.think = think
+        self.timeout = timeout
+        self.setup = Recorder()  # login and socket connect, timed over the ramp-up
+        self.recorder = Recorder()
+        self.pending: Dict[object, asyncio.Future] = {}
+        self.http = httpx.AsyncClient(base_url=url, timeout=timeout,
+                                      limits=httpx.Limits(max_connections=max(users, 10)))
+        self.users = [VirtualUser(self, f"{prefix}{n}@example.com") for n in range(users)]
+        self._emails = [user.email for user in self.users]
+
+    def peer_of(self, email: str) -> str:
+        while True:
+            peer = random.choice(self._emails)
+            if peer != email or len(self._emails) == 1:
+                return peer
+
+    async def register(self, email: str) -> None:
+        # Registration hashes passwords on a bounded pool; back off on 503
+        while True:
+            response = await self.http.post("/auth/register", json={"email": email, "password": PASSWORD})
+            if response.status_code == 503:
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+                continue
+            # Accounts left by an earlier run against the same server are fine
+            if response.status_code == 200 or (
+                response.status_code == 400 and "already registered" in response.text
+            ):
+                return
+            raise RuntimeError(f"registration failed for {email}: {response.status_code} {response.text}")
+
+    async def run(self, duration: float) -> dict:
+        await asyncio.gather(*(self.register(email) for email in self._emails))
+        started = time.perf_counter()
+        await asyncio.gather(*(user.login() for user in self.users))
+        setup_elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        await asyncio.gather(*(user.run(started + duration) for user in self.users))
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(user.close() for user in self.users))
+        await self.http.aclose()
+
+        operations = self.recorder.report(elapsed)
+        return {
+            "users": len(self.users),
+            "duration_s": round(elapsed, 2),
+            "total_rps": round(sum(stats["rps"] for stats in operations.values()), 1),
+            "setup": self.setup.report(setup_elapsed),
+            "operations": operations,
+        }
+
+
+def check(result: dict, thresholds: Dict[str, dict]) -> List[str]:
+    """Compare a result against thresholds such as ``{"send_message": {"p95_ms": 50}}``.
+
+    ``*_ms`` and ``error_rate`` limits are maximums, ``min_rps`` is a minimum.
+    Operations missing from the result are treated as having no samples.
+    """
+    measured = {**result["setup"], **result["operations"]}
+    violations = []
+    for op, limits in thresholds.items():
+        stats = measured.get(op, {})
+        for name, limit in limits.items():
+            if name == "min_rps":
+                value = stats.get("rps", 0.0)
+                if value < limit:
+                    violations.append(f"{op} rps {value} < {limit}")
+            else:
+                value = stats.get(name)
+                if value is None or value > limit:
+                    violations.append(f"{op} {name} {value} > {limit}")
+    return violations
+
+
+async def serve_in_process():
+    """Start main.sio_app under uvicorn on a free local port; returns (url, server, task)."""
+    os.environ.setdefault(
+        "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    )
+    os.environ.setdefault("SOCKETIO_MANAGER", "memory")
+    import socket
+    import uvicorn
+    from app.main import sio_app
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(sio_app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            await task
+        await asyncio.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server, task
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="server to test; default starts the app in this process")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of steady load")
+    parser.add_argument("--think-ms", type=float, default=50.0, help="mean pause between a user's operations")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds before an operation counts as failed")
+    parser.add_argument("--prefix", default="loaduser", help="virtual users are <prefix><n>@example.com")
+    parser.add_argument("--thresholds", help="JSON file of per-operation limits to gate on")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = task = None
+    url = args.url
+    # Keep stdout for the JSON result; the in-process app logs with print
+    with contextlib.redirect_stdout(sys.stderr):
+        if url is None:
+            url, server, task = await serve_in_process()
+        try:
+            harness = Harness(url, args.users, args.think_ms / 1000, args.timeout, args.prefix)
+            result = await harness.run(args.duration)
+        finally:
+            if server is not None:
+                server.should_exit = True
+                await task
+
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            result["violations"] = check(result, json.load(f))
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 1 if result.get("violations") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
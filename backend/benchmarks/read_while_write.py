@@ -0,0 +1,124 @@
+"""Read latency while writes are in flight: default SQLite engine vs the tuned profile.
+
+Run from ``backend/``::
+
+    python -m benchmarks.read_while_write --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import conversations
+from app.database import Base, make_async_engine, make_engine, make_session_factory
+from app.models import Message
+
+
+def prepare(path: str, messages: int, journal_mode: str) -> None:
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert(), [
+            {"sender": f"user{n % 50}@example.com", "recipient": f"user{(n + 1) % 50}@example.com",
+             "content": f"seed {n}"}
+            for n in range(messages)
+        ])
+        conn.exec_driver_sql(f"PRAGMA journal_mode = {journal_mode}")
+    engine.dispose()
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(int(len(values) * p), len(values) - 1)] * 1000, 2)
+
+
+async def run(session_factory, readers: int, writers: int, seconds: float) -> dict:
+    read_latencies, write_latencies = [], []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def reader(index: int) -> None:
+        nonlocal errors
+        me, peer = f"user{index % 50}@example.com", f"user{(index + 1) % 50}@example.com"
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session_factory() as db:
+                    await db.execute(
+                        select(Message).where(Message.sender == me, Message.recipient == peer)
+                        .order_by(Message.timestamp.desc(), Message.id.desc()).limit(50)
+                    )
+            except Exception:
+                errors += 1
+                continue
+            read_latencies.append(time.perf_counter() - started)
+
+    async def writer(index: int) -> None:
+        nonlocal errors
+        n = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session_factory() as db:
+                    message = Message(sender=f"user{index}@example.com", recipient="user0@example.com",
+                                      content=f"bench {n}")
+                    db.add(message)
+                    await db.flush()
+                    await conversations.record_message(db, message)
+                    await db.commit()
+            except Exception:
+                errors += 1
+                continue
+            write_latencies.append(time.perf_counter() - started)
+            n += 1
+
+    await asyncio.gather(*(reader(i) for i in range(readers)), *(writer(i) for i in range(writers)))
+    return {
+        "reads_per_sec": round(len(read_latencies) / seconds, 1),
+        "read_p50_ms": percentile(read_latencies, 0.50),
+        "read_p99_ms": percentile(read_latencies, 0.99),
+        "writes_per_sec": round(len(write_latencies) / seconds, 1),
+        "write_p99_ms": percentile(write_latencies, 0.99),
+        "errors": errors,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    results = {}
+
+    # The original setup: one default pool, rollback journal
+    path = os.path.join(directory, "default.db")
+    prepare(path, args.messages, "DELETE")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    factory = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    results["default"] = await run(factory, args.readers, args.writers, args.seconds)
+    await engine.dispose()
+
+    # WAL + pragmas, reader pool plus a single writer connection
+    path = os.path.join(directory, "tuned.db")
+    prepare(path, args.messages, "WAL")
+    reader = make_async_engine(f"sqlite+aiosqlite:///{path}")
+    writer = make_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=1, max_overflow=0)
+    results["tuned"] = await run(make_session_factory(reader, writer), args.readers, args.writers, args.seconds)
+    await reader.dispose()
+    await writer.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Compare per-message commits with the group-commit write pipeline.
+
+Run from ``backend/``::
+
+    python -m benchmarks.send_pipeline --senders 100 --messages 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+
+from app import conversations  # noqa: E402
+from app.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.models import ActivityLog, Message, MessageStatus  # noqa: E402
+from app.activity_sink import activity_sink  # noqa: E402
+from app.pipeline import message_pipeline  # noqa: E402
+
+
+async def per_message_send(sender: str, recipient: str, content: str) -> None:
+    """The original send path: three commits and a refresh per message."""
+    async with AsyncSessionLocal() as db:
+        message = Message(sender=sender, recipient=recipient, content=content)
+        db.add(message)
+        await db.flush()
+        await conversations.record_message(db, message)
+        await db.commit()
+        await db.refresh(message)
+        db.add(ActivityLog(user_email=sender, action="message_sent", details=content))
+        await db.commit()
+        message.status = MessageStatus.DELIVERED
+        await db.commit()
+
+
+async def pipeline_send(sender: str, recipient: str, content: str) -> None:
+    await message_pipeline.submit(sender, recipient, content, status=MessageStatus.DELIVERED)
+    await activity_sink.record(sender, "message_sent", content)
+
+
+async def run(send, senders: int, messages: int) -> dict:
+    latencies = []
+
+    async def sender_loop(index: int) -> None:
+        for n in range(messages):
+            started = time.perf_counter()
+            await send(f"user{index}@example.com", f"user{(index + 1) % senders}@example.com", f"bench {n}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender_loop(i) for i in range(senders)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    total = senders * messages
+    return {
+        "messages": total,
+        "messages_per_sec": round(total / elapsed, 1),
+        "ack_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "ack_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    results = {
+        "per_message_commit": await run(per_message_send, args.senders, args.messages),
+        "group_commit": await run(pipeline_send, args.senders, args.messages),
+    }
+    results["group_commit"]["pipeline"] = message_pipeline.stats()
+    await message_pipeline.close()
+    await activity_sink.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
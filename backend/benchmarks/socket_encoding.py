@@ -0,0 +1,69 @@
+"""Compare JSON and compact MessagePack Socket.IO packets for typical events.
+
+Run from ``backend/``::
+
+    python -m benchmarks.socket_encoding --rounds 20000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+
+import msgpack
+from socketio import packet
+
+from app.models import MessageStatus
+from app.transport import encode_msgpack
+from app.wire import SocketJSON, message_to_wire
+
+packet.Packet.json = SocketJSON
+
+
+class _Message:
+    id = 123456
+    sender = "alice@example.com"
+    recipient = "bob@example.com"
+    content = "Are we still on for lunch tomorrow at 12:30?"
+    timestamp = datetime(2024, 5, 17, 9, 41, 27, 512000, tzinfo=timezone.utc)
+    status = MessageStatus.DELIVERED
+    is_bot_response = False
+
+
+EVENTS = {
+    "message": message_to_wire(_Message),
+    "status": {"message_ids": [123450, 123451, 123452, 123456], "up_to": 123456, "status": "Read"},
+    "unread": {"peer": "alice@example.com", "unread": 3},
+}
+
+
+def rate(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return round(rounds / (time.perf_counter() - started))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {}
+    for event, payload in EVENTS.items():
+        pkt = packet.Packet(packet.EVENT, data=[event, payload])
+        as_json = pkt.encode()
+        as_msgpack = encode_msgpack(pkt)
+        results[event] = {
+            "json_bytes": len(as_json.encode()),
+            "msgpack_bytes": len(as_msgpack),
+            "json_encode_per_sec": rate(lambda: packet.Packet(packet.EVENT, data=[event, payload]).encode(), args.rounds),
+            "msgpack_encode_per_sec": rate(lambda: encode_msgpack(packet.Packet(packet.EVENT, data=[event, payload])), args.rounds),
+            # What a client spends parsing each frame
+            "json_decode_per_sec": rate(lambda: json.loads(as_json[1:]), args.rounds),
+            "msgpack_decode_per_sec": rate(lambda: msgpack.loads(as_msgpack), args.rounds),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare the old and new per-message encode cost for REST pages and socket emits.
+
+Run from ``backend/``::
+
+    python -m benchmarks.wire_encode --messages 200 --rounds 200
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from pydantic import TypeAdapter
+
+from app.models import Message, MessageStatus
+from app.schemas import MessagePage
+from app.wire import dumps, message_to_wire, orjson
+
+page_adapter = TypeAdapter(MessagePage)
+
+
+def starlette_json(payload) -> bytes:
+    """What JSONResponse did with the validated content."""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def old_rest_page(messages) -> bytes:
+    # response_model: validate every row from attributes, dump, then encode
+    page = page_adapter.validate_python({"messages": messages, "next_cursor": None})
+    return starlette_json(page_adapter.dump_python(page, mode="json"))
+
+
+def new_rest_page(messages) -> bytes:
+    return dumps({"messages": [message_to_wire(m) for m in messages], "next_cursor": None})
+
+
+def old_socket_send(message) -> None:
+    # Sender echo and recipient copy were built and encoded separately
+    for _ in range(2):
+        json.dumps(["message", {
+            "id": message.id,
+            "sender": message.sender,
+            "recipient": message.recipient,
+            "content": message.content,
+            "timestamp": message.timestamp.isoformat(),
+            "status": message.status.value,
+            "is_bot_response": message.is_bot_response
+        }], separators=(",", ":"))
+
+
+def new_socket_send(message) -> None:
+    dumps(["message", message_to_wire(message)]).decode()
+
+
+def same_page(old: bytes, new: bytes) -> bool:
+    """Both encodings carry the same data (UTC may be written Z or +00:00)."""
+    def normalized(raw: bytes):
+        page = json.loads(raw)
+        for m in page["messages"]:
+            m["timestamp"] = datetime.fromisoformat(m["timestamp"].replace("Z", "+00:00"))
+        return page
+    return normalized(old) == normalized(new)
+
+
+def time_per_message(fn, args, count: int, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(*args)
+    return (time.perf_counter() - started) / (rounds * count) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = [
+        Message(
+            id=n,
+            sender="alice@example.com",
+            recipient="bob@example.com",
+            content=f"Message number {n} with a little bit of text in it",
+            timestamp=start + timedelta(seconds=n),
+            status=MessageStatus.DELIVERED,
+            is_bot_response=False,
+        )
+        for n in range(args.messages)
+    ]
+    assert same_page(old_rest_page(messages), new_rest_page(messages))
+
+    def each(fn):
+        return lambda: [fn(m) for m in messages]
+
+    results = {
+        "json_backend": "orjson" if orjson is not None else "json",
+        "rest_page_us_per_message": {
+            "old": round(time_per_message(old_rest_page, (messages,), args.messages, args.rounds), 3),
+            "new": round(time_per_message(new_rest_page, (messages,), args.messages, args.rounds), 3),
+        },
+        "socket_send_us_per_message": {
+            "old": round(time_per_message(each(old_socket_send), (), args.messages, args.rounds), 3),
+            "new": round(time_per_message(each(new_socket_send), (), args.messages, args.rounds), 3),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
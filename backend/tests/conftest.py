@@ -0,0 +1,70 @@
+"""Shared fixtures: a throwaway SQLite database and an in-process HTTP client.
+
+Run from ``backend/``::
+
+    pip install -r tests/requirements.txt
+    python -m pytest tests
+"""
+import asyncio
+import os
+import tempfile
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("ACTIVITY_FLUSH_INTERVAL_MS", "0")
+os.environ.setdefault("ARCHIVE_AFTER_DAYS", "0")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import User  # noqa: E402
+from app.security import create_access_token  # noqa: E402
+from app.pipeline import message_pipeline  # noqa: E402
+from app.activity_sink import activity_sink  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def loop():
+    # One loop for the whole run: the engines, write pipeline and activity
+    # sink keep connections and worker tasks bound to the loop that made them
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(message_pipeline.close())
+    loop.run_until_complete(activity_sink.close())
+    loop.close()
+
+
+@pytest.fixture
+def run(loop):
+    return loop.run_until_complete
+
+
+@pytest.fixture(autouse=True)
+def clean_db(loop):
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    yield
+    # Let the activity sink finish its writes before the next test clears tables
+    loop.run_until_complete(activity_sink.close())
+
+
+@pytest.fixture
+def client(loop):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    yield client
+    loop.run_until_complete(client.aclose())
+
+
+def make_users(*emails: str) -> None:
+    """Insert accounts directly, skipping the password hash."""
+    with SessionLocal() as db:
+        db.add_all(User(email=email, hashed_password="x") for email in emails)
+        db.commit()
+
+
+def auth(email: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
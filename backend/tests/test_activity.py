@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from app.activity_sink import ActivitySink, rollup_activity
+from app.config import settings
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models import ActivityDaily, ActivityLog
+from .conftest import auth, make_users
+
+ALICE = "alice@example.com"
+BOB = "bob@example.com"
+
+
+def _log(user: str, count: int) -> None:
+    start = datetime.now(timezone.utc) - timedelta(minutes=count)
+    with SessionLocal() as db:
+        db.add_all(
+            ActivityLog(user_email=user, action="message_sent", details=f"{user} {n}",
+                        timestamp=start + timedelta(seconds=n))
+            for n in range(count)
+        )
+        db.commit()
+
+
+def test_feed_only_shows_the_callers_activity(run, client):
+    make_users(ALICE, BOB)
+    _log(ALICE, 5)
+    _log(BOB, 3)
+
+    details, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"before": cursor} if cursor else {})}
+        page = run(client.get("/activity", params=params, headers=auth(ALICE))).json()
+        details += [entry["details"] for entry in page["activity"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert details == [f"{ALICE} {n}" for n in reversed(range(5))]
+
+
+def test_export_is_admin_only(run, client, monkeypatch):
+    make_users(ALICE, BOB)
+    _log(ALICE, 2)
+    _log(BOB, 2)
+
+    response = run(client.get("/activity/export", headers=auth(ALICE)))
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", [ALICE])
+    response = run(client.get("/activity/export", headers=auth(ALICE)))
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 4
+
+
+def test_close_writes_the_batch_the_worker_holds(run):
+    sink = ActivitySink(max_queue=100, batch_size=10, flush_interval=0.05, policy="drop")
+
+    async def scenario():
+        for n in range(3):
+            await sink.record(ALICE, "message_sent", f"{ALICE} {n}")
+        # The worker takes the first entry off the queue and waits for more
+        await asyncio.sleep(0.01)
+        await sink.close()
+
+    run(scenario())
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(ActivityLog)) == 3
+    assert sink.stats()["written"] == 3
+
+
+def test_concurrent_rollups_count_each_row_once(run):
+    old = datetime.now(timezone.utc) - timedelta(days=40)
+    with SessionLocal() as db:
+        db.add_all(
+            ActivityLog(user_email=user, action="message_sent", details="x", timestamp=old + timedelta(seconds=n))
+            for user in (ALICE, BOB) for n in range(7)
+        )
+        db.add(ActivityDaily(day=old.date(), user_email=ALICE, action="message_sent", count=10))
+        db.commit()
+    _log(ALICE, 2)
+
+    async def rollup():
+        async with AsyncSessionLocal() as db:
+            return await rollup_activity(db, datetime.now(timezone.utc) - timedelta(days=30), batch_size=3)
+
+    async def two_workers():
+        return await asyncio.gather(rollup(), rollup())
+
+    assert sum(run(two_workers())) == 14
+    with SessionLocal() as db:
+        counts = {row.user_email: row.count for row in db.query(ActivityDaily)}
+        assert counts == {ALICE: 17, BOB: 7}
+        assert db.scalar(select(func.count()).select_from(ActivityLog)) == 2
@@ -0,0 +1,37 @@
+import asyncio
+import fcntl
+from app import broker
+from app.config import settings
+
+
+def test_default_hub_is_specific_to_the_deployment(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SOCKETIO_BROKER_PATH", "")
+    here = broker.broker_path()
+    assert broker.broker_path() == here
+
+    monkeypatch.chdir(tmp_path)
+    other_dir = broker.broker_path()
+    monkeypatch.setattr(settings, "DATABASE_URL", "sqlite:///./other.db")
+    other_db = broker.broker_path()
+    assert len({here, other_dir, other_db}) == 3
+
+
+def test_configured_hub_path_wins(monkeypatch):
+    monkeypatch.setattr(settings, "SOCKETIO_BROKER_PATH", "/run/whatsease.sock")
+    assert broker.broker_path() == "/run/whatsease.sock"
+
+
+def test_publish_gives_up_on_a_hub_that_is_not_listening(run, monkeypatch, tmp_path):
+    path = str(tmp_path / "hub.sock")
+    # A stale worker holds the hub lock without serving the socket
+    stale = open(path + ".lock", "a+")
+    fcntl.flock(stale, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    monkeypatch.setattr(broker, "HUB_CONNECT_ATTEMPTS", 3)
+    manager = broker.LocalBrokerManager(path)
+
+    async def attempt():
+        return await asyncio.wait_for(manager.publish("presence", {}), timeout=5)
+
+    run(attempt())  # logged and dropped instead of waiting forever
+    assert manager._writer is None
+    stale.close()
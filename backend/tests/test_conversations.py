@@ -0,0 +1,45 @@
+import asyncio
+from sqlalchemy import select
+from app import conversations
+from app.database import AsyncSessionLocal
+from app.models import Conversation
+
+ALICE = "alice@example.com"
+BOB = "bob@example.com"
+
+
+async def _record(entries):
+    async with AsyncSessionLocal() as db:
+        counts = await conversations.record_messages(db, entries)
+        await db.commit()
+        return counts
+
+
+async def _summaries():
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(Conversation))).scalars().all()
+
+
+def test_first_messages_for_a_pair_share_one_summary(run):
+    async def scenario():
+        return await asyncio.gather(
+            _record([(ALICE, BOB, 1, True)]),
+            _record([(BOB, ALICE, 2, True)]),
+        )
+
+    run(scenario())
+    summaries = run(_summaries())
+    assert len(summaries) == 1
+    summary = summaries[0]
+    assert (summary.user_a, summary.user_b) == (ALICE, BOB)
+    assert (summary.unread_a, summary.unread_b) == (1, 1)
+
+
+def test_batch_counts_unread_per_reader(run):
+    run(_record([(ALICE, BOB, 1, True)]))
+    counts = run(_record([(ALICE, BOB, 2, True), (ALICE, BOB, 3, False), (BOB, ALICE, 4, True)]))
+
+    assert counts[(BOB, ALICE)] == 2
+    assert counts[(ALICE, BOB)] == 1
+    summary, = run(_summaries())
+    assert summary.last_message_id == 4
@@ -0,0 +1,23 @@
+import os
+import tempfile
+from sqlalchemy import create_engine, inspect, text
+from app.database import create_schema
+
+
+def test_create_schema_adds_indexes_to_existing_tables():
+    # A messages table from before the pagination and pending-delivery indexes
+    legacy = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'legacy.db')}")
+    with legacy.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY, sender VARCHAR NOT NULL, "
+            "recipient VARCHAR NOT NULL, content TEXT NOT NULL, timestamp DATETIME, "
+            "status VARCHAR(9), is_bot_response BOOLEAN)"
+        ))
+
+    create_schema(legacy)
+    create_schema(legacy)
+
+    names = {index["name"] for index in inspect(legacy).get_indexes("messages")}
+    assert {"ix_messages_pair_timestamp", "ix_messages_recipient_status"} <= names
+    names = {index["name"] for index in inspect(legacy).get_indexes("activity_logs")}
+    assert "ix_activity_logs_user_timestamp" in names
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from app.bot_pool import bot_pool
+from app.config import settings
+from app.pipeline import message_pipeline
+from app.routers import messages
+from app.search import UnsupportedBackend
+from .conftest import auth, make_users
+
+ALICE = "alice@example.com"
+BOB = "bob@example.com"
+
+
+def _page_all(run, client, direction, limit=3):
+    ids, cursor = [], None
+    while True:
+        params = {"peer": BOB, "limit": limit}
+        if cursor:
+            params[direction] = cursor
+        response = run(client.get("/messages", params=params, headers=auth(ALICE)))
+        assert response.status_code == 200
+        page = response.json()
+        ids.append([m["id"] for m in page["messages"]])
+        cursor = page["next_cursor"]
+        if cursor is None or len(ids) > 10:
+            return ids
+
+
+def test_history_pages_through_socket_sent_messages(run, client):
+    # All in the same second, written by the socket send path
+    make_users(ALICE, BOB)
+    sent = [
+        run(message_pipeline.submit(*((ALICE, BOB) if n % 2 else (BOB, ALICE)), f"hi {n}")).id
+        for n in range(7)
+    ]
+
+    pages = _page_all(run, client, "before")
+    assert pages == [sent[4:], sent[1:4], sent[:1]]
+
+
+def test_forward_paging_keeps_same_second_rows(run, client):
+    make_users(ALICE, BOB)
+    sent = [run(message_pipeline.submit(ALICE, BOB, f"hi {n}")).id for n in range(7)]
+
+    latest = run(client.get("/messages", params={"peer": BOB, "limit": 4}, headers=auth(ALICE))).json()
+    assert [m["id"] for m in latest["messages"]] == sent[3:]
+
+    # Paging forward from the oldest message of that page finds its neighbours again
+    newer = run(client.get(
+        "/messages", params={"peer": BOB, "limit": 3, "after": latest["next_cursor"]}, headers=auth(ALICE)
+    )).json()
+    assert [m["id"] for m in newer["messages"]] == sent[4:]
+
+
+def test_bot_reply_does_not_hold_the_writer(run, client, monkeypatch):
+    make_users(ALICE, BOB)
+    replying = asyncio.Event()
+
+    async def slow_reply(user, content):
+        replying.set()
+        await asyncio.sleep(1.0)
+        return "later"
+
+    monkeypatch.setattr(bot_pool, "reply", slow_reply)
+
+    async def scenario():
+        request = asyncio.create_task(client.post(
+            "/messages", json={"recipient": settings.BOT_IDENTIFIER, "content": "hello"}, headers=auth(ALICE)
+        ))
+        await replying.wait()
+        started = time.perf_counter()
+        await message_pipeline.submit(BOB, ALICE, "meanwhile")
+        waited = time.perf_counter() - started
+        response = await request
+        return waited, response
+
+    waited, response = run(scenario())
+    assert response.status_code == 200
+    assert waited < 0.5
+
+
+def test_search_finds_the_callers_messages(run, client):
+    make_users(ALICE, BOB)
+    run(message_pipeline.submit(ALICE, BOB, "lunch at noon?"))
+    run(message_pipeline.submit(BOB, ALICE, "launch is delayed"))
+    run(message_pipeline.submit(BOB, "carol@example.com", "lunch for carol"))
+
+    response = run(client.get("/messages/search", params={"q": "lun"}, headers=auth(ALICE)))
+    assert [hit["content"] for hit in response.json()["results"]] == ["lunch at noon?"]
+
+
+def test_search_on_an_unsupported_backend_is_501(run, client, monkeypatch):
+    async def unsupported(*args):
+        raise UnsupportedBackend("Message search is not supported on mysql")
+
+    make_users(ALICE)
+    monkeypatch.setattr(messages, "search_messages", unsupported)
+    response = run(client.get("/messages/search", params={"q": "hi"}, headers=auth(ALICE)))
+    assert response.status_code == 501
+
+
+def test_search_says_how_far_back_it_reaches(run, client, monkeypatch):
+    make_users(ALICE, BOB)
+    run(message_pipeline.submit(ALICE, BOB, "lunch at noon?"))
+
+    page = run(client.get("/messages/search", params={"q": "lunch"}, headers=auth(ALICE))).json()
+    assert page["searched_since"] is None
+
+    # With archival on, older messages live in segments and are not searched
+    monkeypatch.setattr(settings, "ARCHIVE_AFTER_DAYS", 180)
+    page = run(client.get("/messages/search", params={"q": "lunch"}, headers=auth(ALICE))).json()
+    since = datetime.fromisoformat(page["searched_since"])
+    assert abs(datetime.now(timezone.utc) - timedelta(days=180) - since) < timedelta(minutes=1)
+    assert len(page["results"]) == 1
@@ -0,0 +1,7 @@
+from app.metrics import percentiles_ms
+
+
+def test_percentiles_ms():
+    samples = [n / 1000 for n in range(1, 101)]
+    assert percentiles_ms(samples, "latency") == {"latency_p50_ms": 51.0, "latency_p99_ms": 100.0}
+    assert percentiles_ms([], "ack_latency") == {"ack_latency_p50_ms": 0.0, "ack_latency_p99_ms": 0.0}
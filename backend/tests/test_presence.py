@@ -0,0 +1,41 @@
+import time
+from app.broker import ChannelMixin
+from app.presence import PresenceRegistry
+
+
+class FakeChannel(ChannelMixin):
+    """A channel without host_down announcements, like Redis."""
+
+    def __init__(self, host_id: str):
+        self.host_id = host_id
+        self.published = []
+        self._init_channel()
+
+    async def _publish(self, data: dict) -> None:
+        self.published.append(data)
+
+
+def test_remote_users_are_online_until_their_worker_falls_silent(run):
+    registry = PresenceRegistry()
+    channel = FakeChannel("here")
+    registry.attach(channel)
+
+    run(channel._dispatch({"method": "presence_snapshot", "host_id": "there", "users": ["carol@example.com"]}))
+    assert registry.is_online("carol@example.com")
+
+    registry.expire_silent_hosts(time.time() - 60)
+    assert registry.is_online("carol@example.com")
+    registry.expire_silent_hosts(time.time() + 1)
+    assert not registry.is_online("carol@example.com")
+    assert registry.last_seen("carol@example.com") is not None
+
+
+def test_local_connects_are_published(run):
+    registry = PresenceRegistry()
+    channel = FakeChannel("here")
+    registry.attach(channel)
+
+    run(registry.connect("dave@example.com", "sid-1"))
+    assert channel.published == [
+        {"method": "presence", "host_id": "here", "user": "dave@example.com", "online": True, "at": channel.published[0]["at"]}
+    ]
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from app import conversations
+from app.database import AsyncSessionLocal
+from app import sio as sio_module
+from app.pipeline import message_pipeline
+from app.ratelimit import EventLimiter
+from app.sio import sio
+from .conftest import make_users
+
+ALICE = "alice@example.com"
+BOB = "bob@example.com"
+
+
+@pytest.fixture
+def namespace(monkeypatch):
+    """The Socket.IO handlers, with sessions faked and emits recorded."""
+    handlers = sio.namespace_handlers["/"]
+    emitted = []
+
+    async def get_session(sid):
+        return {"user": sid}
+
+    async def emit(event, data, **kwargs):
+        emitted.append((event, data, kwargs))
+
+    monkeypatch.setattr(handlers, "get_session", get_session)
+    monkeypatch.setattr(handlers, "emit", emit)
+    handlers.emitted = emitted
+    return handlers
+
+
+async def _unread(reader: str, peer: str) -> int:
+    async with AsyncSessionLocal() as db:
+        return await conversations.unread_count(db, reader, peer)
+
+
+def test_marking_one_message_read_twice_counts_once(run, namespace):
+    make_users(ALICE, BOB)
+    first = run(message_pipeline.submit(ALICE, BOB, "one"))
+    run(message_pipeline.submit(ALICE, BOB, "two"))
+
+    async def two_tabs():
+        # Two tabs (or a retried event) mark the same message at once
+        await asyncio.gather(
+            namespace.on_mark_read(BOB, {"message_id": first.id}),
+            namespace.on_mark_read(BOB, {"message_id": first.id}),
+        )
+
+    run(two_tabs())
+
+    assert run(_unread(BOB, ALICE)) == 1
+    unread_events = [data for event, data, _ in namespace.emitted if event == "unread"]
+    assert unread_events == [{"peer": ALICE, "unread": 1}] * 2
+
+
+def test_marking_someone_elses_message_is_ignored(run, namespace):
+    make_users(ALICE, BOB)
+    message = run(message_pipeline.submit(ALICE, BOB, "one"))
+
+    run(namespace.on_mark_read(ALICE, {"message_id": message.id}))
+
+    assert run(_unread(BOB, ALICE)) == 1
+    assert namespace.emitted == []
+
+
+def test_throttled_events_are_acked_with_retry_after(run, namespace, monkeypatch):
+    limiter = EventLimiter(rate=2, burst=1, limits={}, tolerance=0)
+    monkeypatch.setattr(sio_module, "event_limiter", limiter)
+    limiter.connect(ALICE, ALICE)
+
+    assert run(namespace.trigger_event("presence", ALICE, {"users": [BOB]})) == {
+        BOB: {"online": False, "last_seen": None}
+    }
+    ack = run(namespace.trigger_event("presence", ALICE, {"users": [BOB]}))
+    assert ack["error"] == "rate_limited"
+    assert 0 < ack["retry_after"] <= 0.5
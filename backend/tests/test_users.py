@@ -0,0 +1,15 @@
+from app.query_budget import assert_max_queries
+from .conftest import auth, make_users
+
+
+def test_inbox_query_count_does_not_grow_with_users(run, client):
+    make_users("alice@example.com", "bob@example.com")
+    with assert_max_queries(2, "GET /users") as tracker:
+        response = run(client.get("/users", headers=auth("alice@example.com")))
+    assert tracker.count > 0
+    assert [user["email"] for user in response.json()] == ["bob@example.com"]
+
+    make_users(*(f"user{n}@example.com" for n in range(50)))
+    with assert_max_queries(2, "GET /users"):
+        response = run(client.get("/users", headers=auth("alice@example.com")))
+    assert len(response.json()) == 51
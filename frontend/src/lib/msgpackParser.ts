@@ -0,0 +1,48 @@
+import { decode, encode } from '@msgpack/msgpack'
+import { Emitter } from '@socket.io/component-emitter'
+
+// Socket.IO parser for servers that speak MessagePack (see socket.ts).
+// The server sends events in a compact schema; they are expanded here so
+// the rest of the app sees the same payloads as over JSON.
+
+const STATUS = ['Sent', 'Delivered', 'Read'] as const
+
+const expandMessage = (m: any) => ({
+  id: m.i,
+  sender: m.s,
+  recipient: m.r,
+  content: m.c,
+  timestamp: new Date(m.t).toISOString(),
+  status: STATUS[m.st],
+  is_bot_response: m.b,
+})
+
+const EXPAND: Record<string, (payload: any) => any> = {
+  message: expandMessage,
+  messages: (batch: any[]) => batch.map(expandMessage),
+  status: (p: any) => ({ message_ids: p.i, up_to: p.u, status: STATUS[p.st] }),
+  unread: (p: any) => ({ peer: p.p, unread: p.n }),
+  typing: (p: any) => ({ peer: p.p, typing: p.y }),
+}
+
+const EVENT = 2
+
+export const protocol = 5
+
+export class Encoder {
+  encode(packet: any) {
+    return [encode(packet, { ignoreUndefined: true })]
+  }
+}
+
+export class Decoder extends Emitter<any, any, any> {
+  add(chunk: ArrayBuffer | Uint8Array) {
+    const packet: any = decode(chunk instanceof ArrayBuffer ? new Uint8Array(chunk) : chunk)
+    if (packet.type === EVENT && Array.isArray(packet.data) && EXPAND[packet.data[0]]) {
+      packet.data = [packet.data[0], EXPAND[packet.data[0]](packet.data[1])]
+    }
+    this.emit('decoded', packet)
+  }
+
+  destroy() {}
+}
@@ -1,6 +1,9 @@
 import { io, Socket } from 'socket.io-client'
+import * as msgpackParser from './msgpackParser'
 
 const BASE = import.meta.env.VITE_API_BASE || 'http://127.0.0.1:8000'
+// 'msgpack' switches to the smaller binary encoding (server negotiates per connection)
+const MSGPACK = import.meta.env.VITE_WS_SERIALIZER === 'msgpack'
 
 let socket: Socket | null = null
 
@@ -12,9 +15,8 @@ export function getSocket(): Socket {
     auth: token ? { token } : undefined,
     transports: ['websocket'],
     withCredentials: false,
-    query: token ? { token } : {},
+    query: { ...(token ? { token } : {}), ...(MSGPACK ? { serializer: 'msgpack' } : {}) },
+    ...(MSGPACK ? { parser: msgpackParser } : {}),
   })
   return socket
 }
-
-
@@ -2,6 +2,7 @@ import { useEffect, useState } from 'react'
 import { api } from '../lib/api'
 
 type Activity = { user_email: string, action: string, details: string, timestamp: string }
+type ActivityPage = { activity: Activity[], next_cursor: string | null }
 
 export default function ActivityPage() {
   const [items, setItems] = useState<Activity[]>([])
@@ -10,9 +11,9 @@ export default function ActivityPage() {
   useEffect(() => {
     const fetchActivities = () => {
       console.log('Activity: Fetching activities...')
-      api('/activity').then((activities) => {
-        console.log('Activity: Activities received:', activities)
-        setItems(activities)
+      api('/activity').then((page: ActivityPage) => {
+        console.log('Activity: Activities received:', page.activity)
+        setItems(page.activity)
       }).catch((e) => {
         console.error('Activity: Failed to fetch activities:', e)
         setError(String(e))
@@ -30,7 +31,7 @@ export default function ActivityPage() {
 
   return (
     <div style={{ padding: 16 }}>
-      <h2>Recent Activity</h2>
+      <h2>My Activity</h2>
       {error && <div role="alert" style={{ color: 'crimson' }}>{error}</div>}
       <ul className="list">
         {items.map((a, i) => (
@@ -19,6 +19,8 @@ export default function Chat() {
   const [messages, setMessages] = useState<Msg[]>([])
   const [text, setText] = useState('')
   const [loading, setLoading] = useState(true)
+  const [olderCursor, setOlderCursor] = useState<string | null>(null)
+  const [peerTyping, setPeerTyping] = useState(false)
   const sioRef = useRef<ReturnType<typeof getSocket> | null>(null)
   const me = useMe()
 
@@ -33,18 +35,21 @@ export default function Chat() {
     
     api(`/messages?peer=${encodeURIComponent(peer)}`).then((res) => {
       if (isMounted) {
-        setMessages(res)
+        setMessages(res.messages)
+        setOlderCursor(res.next_cursor)
         // Mark unread messages as read when opening the chat
         if (me) {
           const s = sioRef.current || getSocket()
-          res.filter((m: Msg) => m.recipient === me && m.status !== 'Read').forEach((m: Msg) => {
-            s.emit('mark_read', { message_id: m.id })
-          })
+          const unread = res.messages.filter((m: Msg) => m.recipient === me && m.status !== 'Read')
+          if (unread.length) {
+            // One watermark receipt covers every unread message on the page
+            s.emit('mark_read_up_to', { peer, up_to: unread[unread.length - 1].id })
+          }
         }
       }
     }).catch((error) => {
       console.error('Chat: Failed to fetch messages:', error)
-      if (isMounted) setMessages([])
+      if (isMounted) { setMessages([]); setOlderCursor(null) }
     }).finally(() => setLoading(false))
     return () => { isMounted = false }
   }, [peer, me])
@@ -54,22 +59,45 @@ export default function Chat() {
     sioRef.current = s
     const onMessage = (incoming: Msg) => {
       setMessages(prev => [...prev, incoming])
-      if (me && incoming.recipient === me) {
+      if (me && incoming.recipient === me && incoming.sender === peer) {
         // report read via socket for immediate feedback
-        s.emit('mark_read', { message_id: incoming.id })
+        s.emit('mark_read_up_to', { peer, up_to: incoming.id })
       }
       // Notify inbox to increment unread when I am not the recipient (i.e., for other peers viewing their list)
       if (me && incoming.recipient === me) {
         // My unread handled by mark_read above (zero). For other tabs/users the server handles.
       }
     }
-    const onStatus = (p: { message_id: string, status: 'Delivered' | 'Read' }) => {
-      setMessages(prev => prev.map(m => m.id === p.message_id ? { ...m, status: p.status } as Msg : m))
+    // Messages that piled up while offline arrive in chunks on reconnect
+    const onMessages = (batch: Msg[]) => {
+      const fromPeer = batch.filter(m => m.sender === peer)
+      if (fromPeer.length) setMessages(prev => [...prev, ...fromPeer])
+    }
+    const onStatus = (p: { message_id?: string, message_ids?: string[], status: 'Delivered' | 'Read' }) => {
+      const ids = new Set(p.message_ids ?? (p.message_id !== undefined ? [p.message_id] : []))
+      setMessages(prev => prev.map(m => ids.has(m.id) ? { ...m, status: p.status } as Msg : m))
     }
+    const onTyping = (p: { peer: string, typing: boolean }) => {
+      if (p.peer === peer) setPeerTyping(p.typing)
+    }
+    setPeerTyping(false)
     s.on('message', onMessage)
+    s.on('messages', onMessages)
     s.on('status', onStatus)
-    return () => { s.off('message', onMessage); s.off('status', onStatus) }
-  }, [me])
+    s.on('typing', onTyping)
+    return () => { s.off('message', onMessage); s.off('messages', onMessages); s.off('status', onStatus); s.off('typing', onTyping) }
+  }, [me, peer])
+
+  async function loadOlder() {
+    if (!olderCursor) return
+    try {
+      const res = await api(`/messages?peer=${encodeURIComponent(peer)}&before=${encodeURIComponent(olderCursor)}`)
+      setMessages(prev => [...res.messages, ...prev])
+      setOlderCursor(res.next_cursor)
+    } catch (e) {
+      console.error('Chat: Failed to fetch older messages:', e)
+    }
+  }
 
   async function send()
   {
@@ -109,6 +137,7 @@ export default function Chat() {
     <div className="content">
       <div className="chat-header">Chat with {peer}</div>
       <div className="messages" aria-live="polite">
+      {!loading && olderCursor && <button onClick={loadOlder} aria-label="Load earlier messages">Load earlier messages</button>}
       {loading ? 'Loading…' : messages.map((m: Msg) => {
           const isMine = me ? m.sender === me : false
           return (
@@ -117,6 +146,7 @@ export default function Chat() {
             <small>{new Date(m.timestamp).toLocaleTimeString()} — {m.status}</small>
           </div>
         )})}
+      {peerTyping && <small aria-live="polite">{peer} is typing…</small>}
       </div>
       <div className="composer">
         <input aria-label="Message" value={text} onChange={(e: React.ChangeEvent<HTMLInputElement>) => setText(e.target.value)} onKeyDown={(e: React.KeyboardEvent<HTMLInputElement>) => { if (e.key === 'Enter') send() }} />
@@ -2,12 +2,24 @@ import { useEffect, useMemo, useState } from 'react'
 import { Link } from 'react-router-dom'
 import { api } from '../lib/api'
 import { getSocket } from '../lib/socket'
+import { useMe } from '../lib/useMe'
 
-type User = { email: string, unread: number }
+type User = { email: string, unread: number, online?: boolean }
+type Hit = { id: string, sender: string, recipient: string, snippet: string }
+
+// Snippets mark matches with <mark>…</mark>; render them as text, never as HTML
+function Snippet({ text }: { text: string }) {
+  const parts = text.split(/<\/?mark>/)
+  return <>{parts.map((part, i) => i % 2 ? <mark key={i}>{part}</mark> : <span key={i}>{part}</span>)}</>
+}
 
 export default function Inbox() {
   const [users, setUsers] = useState<User[]>([])
   const [q, setQ] = useState('')
+  const [hits, setHits] = useState<Hit[]>([])
+  // Set when older messages are archived and left out of search
+  const [searchedSince, setSearchedSince] = useState<string | null>(null)
+  const me = useMe()
 
   useEffect(() => {
     console.log('Inbox: Fetching users...')
@@ -34,23 +46,51 @@ export default function Inbox() {
     return () => { clearInterval(interval); s.off('unread', onUnread) }
   }, [])
 
+  // Full-text search over my conversations, debounced while typing
+  useEffect(() => {
+    if (q.trim().length < 2) { setHits([]); setSearchedSince(null); return }
+    const timer = setTimeout(() => {
+      api(`/messages/search?q=${encodeURIComponent(q)}`)
+        .then((res) => { setHits(res.results); setSearchedSince(res.searched_since ?? null) })
+        .catch(() => { setHits([]); setSearchedSince(null) })
+    }, 300)
+    return () => clearTimeout(timer)
+  }, [q])
+
   const filtered = useMemo(() => users.filter(u => u.email.toLowerCase().includes(q.toLowerCase())), [users, q])
 
   return (
     <div className="layout">
       <aside className="sidebar" aria-label="Chats">
         <div className="searchbar">
-          <input aria-label="Search users" placeholder="Search users" value={q} onChange={e => setQ(e.target.value)} />
+          <input aria-label="Search users" placeholder="Search users and messages" value={q} onChange={e => setQ(e.target.value)} />
         </div>
         <ul className="list" role="listbox">
           {filtered.map(u => (
             <li key={u.email} className="list-item" tabIndex={0}>
               <Link to={`/chat/${encodeURIComponent(u.email)}`}>{u.email}</Link>
+              {u.online && <span aria-label="online" title="online"> ●</span>}
               {u.unread > 0 && <span className="badge" aria-label={`${u.unread} unread messages`}>{u.unread}</span>}
             </li>
           ))}
           <li className="list-item"><Link to="/bot">Chat with Bot</Link></li>
         </ul>
+        {hits.length > 0 && (
+          <ul className="list" aria-label="Message search results">
+            {hits.map(h => {
+              const peer = h.sender === me ? h.recipient : h.sender
+              return (
+                <li key={h.id} className="list-item">
+                  <Link to={`/chat/${encodeURIComponent(peer)}`}>{peer}</Link>
+                  <div><small><Snippet text={h.snippet} /></small></div>
+                </li>
+              )
+            })}
+          </ul>
+        )}
+        {searchedSince && q.trim().length >= 2 && (
+          <p><small>Searched messages since {new Date(searchedSince).toLocaleDateString()}; older ones are archived.</small></p>
+        )}
       </aside>
       <main className="content" aria-live="polite">
         <div className="chat-header">Select a chat</div>